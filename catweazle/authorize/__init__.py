@@ -3,6 +3,8 @@ import typing
 
 from fastapi import Request
 
+import catweazle.tracing
+
 from catweazle.crud.users import CrudUsers
 from catweazle.crud.credentials import CrudCredentials
 from catweazle.crud.permissions import CrudPermissions
@@ -46,25 +48,52 @@ class Authorize:
         return self._log
 
     async def get_user(self, request: Request) -> ModelV2UserGet:
-        user = self.get_user_from_session(request=request)
-        if not user:
-            user = await self.get_user_from_credentials(request=request)
-        if not user:
-            raise SessionCredentialError
-        user = await self.crud_users.get(_id=user, fields=["id", "admin"])
-        return user
+        with catweazle.tracing.span("authorize.get_user"):
+            user = self.get_user_from_session(request=request)
+            if not user:
+                user = await self.get_user_from_credentials(request=request)
+            if not user:
+                raise SessionCredentialError
+            user = await self.crud_users.get(_id=user, fields=["id", "admin"])
+            return user
+
+    async def get_user_or_anonymous(
+        self, request: Request
+    ) -> typing.Optional[ModelV2UserGet]:
+        if not self.has_credentials(request=request):
+            self.log.debug("no session or credentials present, anonymous request")
+            return None
+        try:
+            return await self.get_user(request=request)
+        except SessionCredentialError:
+            return None
 
     async def get_user_from_credentials(
         self, request: Request
     ) -> ModelV2UserGet | None:
-        try:
-            self.log.info("trying to get user from credentials")
-            user = await self.crud_users_credentials.check_credential(request=request)
-            self.log.debug(f"received user {user} from credentials")
-            return user
-        except (CredentialError, ResourceNotFound):
-            self.log.debug("trying to get user from credentials, failed")
+        if not self.has_credential_headers(request=request):
             return None
+        with catweazle.tracing.span("authorize.get_user_from_credentials"):
+            try:
+                self.log.debug("trying to get user from credentials")
+                user = await self.crud_users_credentials.check_credential(
+                    request=request
+                )
+                self.log.debug("received user %s from credentials", user)
+                return user
+            except (CredentialError, ResourceNotFound):
+                self.log.debug("trying to get user from credentials, failed")
+                return None
+
+    @staticmethod
+    def has_credential_headers(request: Request) -> bool:
+        return bool(request.headers.get("x-secret-id") or request.headers.get("x-id"))
+
+    def has_credentials(self, request: Request) -> bool:
+        return bool(
+            request.session.get("username")
+            or self.has_credential_headers(request=request)
+        )
 
     def get_user_from_session(self, request: Request) -> typing.Optional[str]:
         self.log.debug("trying to get user from session")
@@ -73,15 +102,16 @@ class Authorize:
             self.log.debug("trying to get user from session, failed")
             return None
         else:
-            self.log.debug(f"received user {user} from session")
+            self.log.debug("received user %s from session", user)
             return user
 
     async def require_admin(self, request, user=None) -> ModelV2UserGet:
-        if not user:
-            user = await self.get_user(request=request)
-        if not user.admin:
-            raise AdminError
-        return user
+        with catweazle.tracing.span("authorize.require_admin"):
+            if not user:
+                user = await self.get_user(request=request)
+            if not user.admin:
+                raise AdminError
+            return user
 
     async def require_user(self, request) -> ModelV2UserGet:
         user = await self.get_user(request)
@@ -90,21 +120,22 @@ class Authorize:
     async def require_permission(
         self, request, permission, user=None
     ) -> ModelV2UserGet:
-        if not user:
-            user = await self.get_user(request)
-        try:
-            return await self.require_admin(request=request, user=user)
-        except AdminError:
-            pass
-        permissions = await self.crud_permission.search(
-            users=f"^{user.id}$",
-            permissions=f"^{permission}$",
-            sort="id",
-            sort_order="ascending",
-            page=0,
-            limit=1,
-            fields=["id"],
-        )
-        if not permissions.result:
-            raise PermError(permission=permission)
-        return user
+        with catweazle.tracing.span(
+            "authorize.require_permission",
+            attributes={"catweazle.permission": permission},
+        ):
+            if not user:
+                user = await self.get_user(request)
+            if not user.admin:
+                permissions = await self.crud_permission.search(
+                    users=f"^{user.id}$",
+                    permissions=f"^{permission}$",
+                    sort="id",
+                    sort_order="ascending",
+                    page=0,
+                    limit=1,
+                    fields=["id"],
+                )
+                if not permissions.result:
+                    raise PermError(permission=permission)
+            return user
@@ -1,6 +1,8 @@
+import functools
 import typing
 
 from pydantic import BaseModel
+from pydantic import NonNegativeFloat
 from pydantic import StrictStr
 from pydantic import field_validator
 from pydantic.networks import IPv4Network
@@ -11,6 +13,16 @@ log_levels = typing.Literal[
     "CRITICAL", "FATAL", "ERROR", "WARN", "WARNING", "INFO", "DEBUG"
 ]
 
+log_formats = typing.Literal["text", "json"]
+
+loop_literal = typing.Literal["auto", "asyncio", "uvloop"]
+
+http_literal = typing.Literal["auto", "h11", "httptools"]
+
+read_preferences = typing.Literal[
+    "primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"
+]
+
 
 class ConfigApp(BaseModel):
     loglevel: log_levels = "INFO"
@@ -21,6 +33,22 @@ class ConfigApp(BaseModel):
     domainsuffix: str = ".example.com"
     proxyheaders: typing.Optional[bool] = False
     forwardedallowips: typing.Optional[str] = "127.0.0.0/8"
+    workers: int = 1
+    loop: loop_literal = "auto"
+    http: http_literal = "auto"
+    backlog: int = 2048
+    limitconcurrency: typing.Optional[int] = None
+    timeoutkeepalive: int = 5
+    uds: typing.Optional[str] = None
+    metrics: bool = True
+
+
+class ConfigLogging(BaseModel):
+    format: log_formats = "text"
+    queuesize: int = 10000
+    ratelimit: typing.Optional[float] = None
+    rateburst: int = 100
+    sample: float = 1.0
 
 
 class ConfigLdap(BaseModel):
@@ -29,11 +57,49 @@ class ConfigLdap(BaseModel):
     binddn: typing.Optional[str] = None
     password: typing.Optional[str] = None
     userpattern: typing.Optional[str] = None
+    poolmin: int = 1
+    poolmax: int = 30
+    pooltimeout: float = 10.0
+    retries: int = 3
+    retrybackoff: float = 0.1
 
 
 class ConfigMongodb(BaseModel):
     url: str = "mongodb://localhost:27017"
     database: str = "catweazle"
+    maxpoolsize: typing.Optional[int] = None
+    minpoolsize: typing.Optional[int] = None
+    maxidletimems: typing.Optional[int] = None
+    compressors: typing.Optional[str] = None
+    connecttimeoutms: typing.Optional[int] = None
+    sockettimeoutms: typing.Optional[int] = None
+    serverselectiontimeoutms: typing.Optional[int] = None
+    readpreference: typing.Optional[read_preferences] = None
+    searchreadpreference: typing.Optional[read_preferences] = None
+    changestream: bool = False
+    instancesreplica: bool = False
+    instancesreplicamaxlag: float = 5.0
+
+
+class ConfigGc(BaseModel):
+    enable: bool = False
+    interval: int = 3600
+    states: str = "terminated"
+    stateage: int = 3600
+    maxage: typing.Optional[int] = None
+    batchsize: int = 100
+    rate: NonNegativeFloat = 10.0
+
+
+class ConfigHealth(BaseModel):
+    interval: float = 5.0
+    timeout: float = 2.0
+    maxage: float = 30.0
+
+
+class ConfigIdempotency(BaseModel):
+    ttl: int = 86400
+    pendingtimeout: int = 60
 
 
 class ConfigOAuthClient(BaseModel):
@@ -55,6 +121,22 @@ class ConfigOAuth(BaseModel):
     url: ConfigOAuthUrl
 
 
+class ConfigAudit(BaseModel):
+    retention: int = 7776000
+    queuesize: int = 10000
+    batchsize: int = 500
+    flushinterval: float = 1.0
+    blocktimeout: float = 0.0
+
+
+class ConfigTracing(BaseModel):
+    enable: bool = False
+    exporter: str = "console"
+    file: str = "catweazle-traces.jsonl"
+    samplerate: float = 1.0
+    servicename: str = "catweazle"
+
+
 class ConfigForeman(BaseModel):
     url: StrictStr
     sslca: typing.Optional[StrictStr] = None
@@ -79,8 +161,19 @@ class ConfigForeman(BaseModel):
 
 class Config(BaseSettings):
     app: ConfigApp = ConfigApp()
+    audit: ConfigAudit = ConfigAudit()
     ldap: ConfigLdap = ConfigLdap()
+    logging: ConfigLogging = ConfigLogging()
     mongodb: ConfigMongodb = ConfigMongodb()
+    gc: ConfigGc = ConfigGc()
+    health: ConfigHealth = ConfigHealth()
+    idempotency: ConfigIdempotency = ConfigIdempotency()
+    tracing: ConfigTracing = ConfigTracing()
     foreman: typing.Optional[dict[str, ConfigForeman]] = None
     oauth: typing.Optional[dict[str, ConfigOAuth]] = None
     model_config = SettingsConfigDict(env_file=".env", env_nested_delimiter="_")
+
+
+@functools.lru_cache(maxsize=None)
+def get_config() -> Config:
+    return Config()
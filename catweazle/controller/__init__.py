@@ -7,12 +7,18 @@ from fastapi import APIRouter
 from catweazle.authorize import Authorize
 
 from catweazle.controller.api import ControllerApi
+from catweazle.controller.health import ControllerHealth
+from catweazle.controller.metrics import ControllerMetrics
 from catweazle.controller.oauth import ControllerOauth
 
+from catweazle.crud.audit import CrudAudit
 from catweazle.crud.credentials import CrudCredentials
 from catweazle.crud.ldap import CrudLdap
 from catweazle.crud.foreman import CrudForeman
+from catweazle.crud.idempotency import CrudIdempotency
+from catweazle.crud.health import CrudHealth
 from catweazle.crud.instances import CrudInstances
+from catweazle.crud.instances_gc import CrudInstancesGc
 from catweazle.crud.oauth import CrudOAuth
 from catweazle.crud.permissions import CrudPermissions
 from catweazle.crud.users import CrudUsers
@@ -23,14 +29,19 @@ class Controller:
         self,
         log: logging.Logger,
         authorize: Authorize,
+        crud_audit: CrudAudit,
         crud_ldap: CrudLdap,
         crud_foreman_backends: List[CrudForeman],
+        crud_health: CrudHealth,
         crud_instances: CrudInstances,
+        crud_idempotency: CrudIdempotency,
+        crud_instances_gc: CrudInstancesGc,
         crud_oauth: dict[str, CrudOAuth],
         crud_permissions: CrudPermissions,
         crud_users: CrudUsers,
         crud_users_credentials: CrudCredentials,
         http: httpx.AsyncClient,
+        metrics: bool = True,
     ):
         self._log = log
         self._router = APIRouter()
@@ -39,8 +50,11 @@ class Controller:
             ControllerApi(
                 log=log,
                 authorize=authorize,
+                crud_audit=crud_audit,
                 crud_ldap=crud_ldap,
                 crud_instances=crud_instances,
+                crud_idempotency=crud_idempotency,
+                crud_instances_gc=crud_instances_gc,
                 crud_permissions=crud_permissions,
                 crud_users=crud_users,
                 crud_users_credentials=crud_users_credentials,
@@ -62,6 +76,20 @@ class Controller:
             responses={404: {"description": "Not found"}},
         )
 
+        self.router.include_router(
+            ControllerHealth(
+                log=log,
+                crud_health=crud_health,
+            ).router,
+        )
+
+        if metrics:
+            self.router.include_router(
+                ControllerMetrics(
+                    log=log,
+                ).router,
+            )
+
     @property
     def router(self):
         return self._router
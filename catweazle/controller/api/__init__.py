@@ -9,10 +9,13 @@ from catweazle.authorize import Authorize
 from catweazle.controller.api.v1 import ControllerApiV1
 from catweazle.controller.api.v2 import ControllerApiV2
 
+from catweazle.crud.audit import CrudAudit
 from catweazle.crud.credentials import CrudCredentials
 from catweazle.crud.ldap import CrudLdap
 from catweazle.crud.foreman import CrudForeman
+from catweazle.crud.idempotency import CrudIdempotency
 from catweazle.crud.instances import CrudInstances
+from catweazle.crud.instances_gc import CrudInstancesGc
 from catweazle.crud.permissions import CrudPermissions
 from catweazle.crud.users import CrudUsers
 
@@ -24,9 +27,12 @@ class ControllerApi:
         self,
         log: logging.Logger,
         authorize: Authorize,
+        crud_audit: CrudAudit,
         crud_ldap: CrudLdap,
         crud_foreman_backends: List[CrudForeman],
         crud_instances: CrudInstances,
+        crud_idempotency: CrudIdempotency,
+        crud_instances_gc: CrudInstancesGc,
         crud_permissions: CrudPermissions,
         crud_users: CrudUsers,
         crud_users_credentials: CrudCredentials,
@@ -39,9 +45,12 @@ class ControllerApi:
             ControllerApiV2(
                 log=log,
                 authorize=authorize,
+                crud_audit=crud_audit,
                 crud_ldap=crud_ldap,
                 crud_foreman_backends=crud_foreman_backends,
                 crud_instances=crud_instances,
+                crud_idempotency=crud_idempotency,
+                crud_instances_gc=crud_instances_gc,
                 crud_permissions=crud_permissions,
                 crud_users=crud_users,
                 crud_users_credentials=crud_users_credentials,
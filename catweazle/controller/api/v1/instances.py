@@ -6,7 +6,6 @@ from fastapi import Query
 from fastapi import Request
 
 from catweazle.authorize import Authorize
-from catweazle.errors import SessionCredentialError
 
 from catweazle.crud.instances import CrudInstances
 
@@ -14,6 +13,11 @@ from catweazle.model.v2.instances import filter_list
 from catweazle.model.v2.instances import filter_literal
 from catweazle.model.v1.instances import ModelV1InstanceGet
 
+from catweazle.response import etag
+from catweazle.response import etag_match
+from catweazle.response import ModelResponse
+from catweazle.response import NotModifiedResponse
+
 
 class ControllerApiV1Instances:
 
@@ -34,6 +38,7 @@ class ControllerApiV1Instances:
             "/{instance_id}",
             self.get,
             response_model=ModelV1InstanceGet,
+            response_class=ModelResponse,
             response_model_exclude_unset=True,
             methods=["GET"],
         )
@@ -60,15 +65,19 @@ class ControllerApiV1Instances:
         request: Request,
         fields: Set[filter_literal] = Query(default=filter_list),
     ):
-        try:
-            await self.authorize.require_user(request=request)
+        client_ip = None
+        if await self.authorize.get_user_or_anonymous(request=request):
             fields.discard("ipa_otp")
-        except SessionCredentialError as err:
-            result = await self.crud_instances.get(
-                _id=instance_id, fields=["id", "ip_address"]
-            )
-            if result.ip_address != request.client.host:
-                raise err
+        else:
+            client_ip = request.client.host
 
-        result = await self.crud_instances.get(_id=instance_id, fields=list(fields))
-        return ModelV1InstanceGet(data=result)
+        instance, identity, version = await self.crud_instances.get_versioned(
+            _id=instance_id, fields=list(fields), client_ip=client_ip
+        )
+        instance_etag = etag(identity=identity, version=version, fields=fields)
+        if etag_match(request=request, value=instance_etag):
+            return NotModifiedResponse(etag=instance_etag)
+        return ModelResponse(
+            ModelV1InstanceGet.model_construct(data=instance),
+            headers={"ETag": instance_etag},
+        )
@@ -6,18 +6,23 @@ from fastapi import APIRouter
 
 from catweazle.authorize import Authorize
 
+from catweazle.controller.api.v2.audit import ControllerApiV2Audit
 from catweazle.controller.api.v2.authenticate import ControllerApiV2Authenticate
 from catweazle.controller.api.v2.instances import ControllerApiV2Instances
+from catweazle.controller.api.v2.ldap import ControllerApiV2Ldap
 from catweazle.controller.api.v2.permissions import ControllerApiV2Permissions
 from catweazle.controller.api.v2.users import ControllerApiV2Users
 from catweazle.controller.api.v2.users_credentials import (
     ControllerApiV2UsersCredentials,
 )
 
+from catweazle.crud.audit import CrudAudit
 from catweazle.crud.credentials import CrudCredentials
 from catweazle.crud.ldap import CrudLdap
 from catweazle.crud.foreman import CrudForeman
+from catweazle.crud.idempotency import CrudIdempotency
 from catweazle.crud.instances import CrudInstances
+from catweazle.crud.instances_gc import CrudInstancesGc
 from catweazle.crud.permissions import CrudPermissions
 from catweazle.crud.users import CrudUsers
 
@@ -27,9 +32,12 @@ class ControllerApiV2:
         self,
         log: logging.Logger,
         authorize: Authorize,
+        crud_audit: CrudAudit,
         crud_ldap: CrudLdap,
         crud_foreman_backends: List[CrudForeman],
         crud_instances: CrudInstances,
+        crud_idempotency: CrudIdempotency,
+        crud_instances_gc: CrudInstancesGc,
         crud_permissions: CrudPermissions,
         crud_users: CrudUsers,
         crud_users_credentials: CrudCredentials,
@@ -38,6 +46,15 @@ class ControllerApiV2:
         self._router = APIRouter()
         self._log = log
 
+        self.router.include_router(
+            ControllerApiV2Audit(
+                log=log,
+                authorize=authorize,
+                crud_audit=crud_audit,
+            ).router,
+            responses={404: {"description": "Not found"}},
+        )
+
         self.router.include_router(
             ControllerApiV2Authenticate(
                 log=log,
@@ -52,16 +69,29 @@ class ControllerApiV2:
             ControllerApiV2Instances(
                 log=log,
                 authorize=authorize,
+                crud_audit=crud_audit,
                 crud_instances=crud_instances,
+                crud_idempotency=crud_idempotency,
+                crud_instances_gc=crud_instances_gc,
                 crud_foreman_backends=crud_foreman_backends,
             ).router,
             responses={404: {"description": "Not found"}},
         )
 
+        self.router.include_router(
+            ControllerApiV2Ldap(
+                log=log,
+                authorize=authorize,
+                crud_ldap=crud_ldap,
+            ).router,
+            responses={404: {"description": "Not found"}},
+        )
+
         self.router.include_router(
             ControllerApiV2Permissions(
                 log=log,
                 authorize=authorize,
+                crud_audit=crud_audit,
                 crud_permissions=crud_permissions,
                 crud_ldap=crud_ldap,
             ).router,
@@ -83,6 +113,7 @@ class ControllerApiV2:
             ControllerApiV2UsersCredentials(
                 log=log,
                 authorize=authorize,
+                crud_audit=crud_audit,
                 crud_users=crud_users,
                 crud_users_credentials=crud_users_credentials,
             ).router,
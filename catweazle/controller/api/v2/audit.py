@@ -0,0 +1,124 @@
+from datetime import datetime
+import logging
+from typing import Set
+
+from fastapi import APIRouter
+from fastapi import Query
+from fastapi import Request
+
+from catweazle.authorize import Authorize
+
+from catweazle.crud.audit import CrudAudit
+
+from catweazle.model.v2.audit import action_literal
+from catweazle.model.v2.audit import filter_list
+from catweazle.model.v2.audit import filter_literal
+from catweazle.model.v2.audit import sort_literal
+from catweazle.model.v2.audit import ModelV2AuditGetMulti
+from catweazle.model.v2.audit import ModelV2AuditStatsGet
+from catweazle.model.v2.common import count_literal
+from catweazle.model.v2.common import sort_order_literal
+
+from catweazle.response import ModelResponse
+
+
+class ControllerApiV2Audit:
+    def __init__(
+        self,
+        log: logging.Logger,
+        authorize: Authorize,
+        crud_audit: CrudAudit,
+    ):
+        self._authorize = authorize
+        self._crud_audit = crud_audit
+        self._log = log
+        self._router = APIRouter(
+            prefix="/audit",
+            tags=["audit"],
+        )
+
+        self.router.add_api_route(
+            "",
+            self.search,
+            response_model=ModelV2AuditGetMulti,
+            response_class=ModelResponse,
+            response_model_exclude_unset=True,
+            methods=["GET"],
+        )
+        self.router.add_api_route(
+            "/_stats",
+            self.get_stats,
+            response_model=ModelV2AuditStatsGet,
+            methods=["GET"],
+        )
+
+    @property
+    def authorize(self):
+        return self._authorize
+
+    @property
+    def crud_audit(self):
+        return self._crud_audit
+
+    @property
+    def log(self):
+        return self._log
+
+    @property
+    def router(self):
+        return self._router
+
+    async def get_stats(self, request: Request):
+        await self.authorize.require_admin(request=request)
+        return ModelV2AuditStatsGet(**self.crud_audit.stats())
+
+    async def search(
+        self,
+        request: Request,
+        actor: str = Query(description="filter: exact match", default=None),
+        action: action_literal = Query(description="filter: exact match", default=None),
+        resource_type: str = Query(description="filter: exact match", default=None),
+        resource_id: str = Query(description="filter: exact match", default=None),
+        since: datetime = Query(
+            description="filter: events at or after this time", default=None
+        ),
+        until: datetime = Query(
+            description="filter: events before this time", default=None
+        ),
+        fields: Set[filter_literal] = Query(default=filter_list),
+        sort: sort_literal = Query(default="timestamp"),
+        sort_order: sort_order_literal = Query(default="descending"),
+        page: int = Query(default=0, ge=0, description="pagination index"),
+        limit: int = Query(
+            default=10,
+            ge=10,
+            le=1000,
+            description="pagination limit, min value 10, max value 1000",
+        ),
+        cursor: str = Query(
+            default=None,
+            description="pagination cursor, as returned in meta.next, takes precedence over page",
+        ),
+        count: count_literal = Query(
+            default="exact",
+            description="how meta.result_size is computed, none skips counting",
+        ),
+    ):
+        await self.authorize.require_admin(request=request)
+        return ModelResponse(
+            await self.crud_audit.search(
+                actor=actor,
+                action=action,
+                resource_type=resource_type,
+                resource_id=resource_id,
+                since=since,
+                until=until,
+                fields=list(fields),
+                sort=sort,
+                sort_order=sort_order,
+                page=page,
+                limit=limit,
+                cursor=cursor,
+                count=count,
+            )
+        )
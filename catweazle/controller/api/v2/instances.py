@@ -1,19 +1,29 @@
+import ipaddress
+import json
 import logging
+import typing
 from typing import List
 from typing import Set
 
 from fastapi import APIRouter
+from fastapi import Header
 from fastapi import Query
 from fastapi import Request
+from fastapi import Response
+from fastapi.responses import StreamingResponse
 
 from catweazle.authorize import Authorize
 
-from catweazle.errors import SessionCredentialError
 
+from catweazle.crud.audit import CrudAudit
+from catweazle.crud.idempotency import CrudIdempotency
 from catweazle.crud.instances import CrudInstances
+from catweazle.crud.instances_gc import CrudInstancesGc
 from catweazle.crud.foreman import CrudForeman
 from catweazle.errors import BackendError
+from catweazle.errors import InvalidMetaFilter
 
+from catweazle.model.v2.common import count_literal
 from catweazle.model.v2.common import ModelV2DataDelete
 from catweazle.model.v2.common import sort_order_literal
 from catweazle.model.v2.instances import filter_list
@@ -21,21 +31,39 @@ from catweazle.model.v2.instances import filter_literal
 from catweazle.model.v2.instances import sort_literal
 from catweazle.model.v2.instances import ModelV2InstanceGet
 from catweazle.model.v2.instances import ModelV2InstanceGetMulti
+from catweazle.model.v2.instances import ModelV2InstanceMget
+from catweazle.model.v2.instances import ModelV2InstanceMgetPost
+from catweazle.model.v2.instances import ModelV2InstancesReplicaGet
 from catweazle.model.v2.instances import ModelV2instancePost
 from catweazle.model.v2.instances import ModelV2instancePut
+from catweazle.model.v2.users import ModelV2UserGet
+
+from catweazle.response import etag
+from catweazle.response import etag_match
+from catweazle.response import ModelResponse
+from catweazle.response import NotModifiedResponse
+
+meta_filter_description = "filter on meta values with meta.<key>=<value>, repeat a key to match any of several values"
 
 
 class ControllerApiV2Instances:
+    wait_max = 60
 
     def __init__(
         self,
         log: logging.Logger,
         authorize: Authorize,
+        crud_audit: CrudAudit,
         crud_instances: CrudInstances,
+        crud_idempotency: CrudIdempotency,
+        crud_instances_gc: CrudInstancesGc,
         crud_foreman_backends: List[CrudForeman],
     ):
         self._authorize = authorize
+        self._crud_audit = crud_audit
         self._crud_instances = crud_instances
+        self._crud_idempotency = crud_idempotency
+        self._crud_instances_gc = crud_instances_gc
         self._crud_foreman_backends = crud_foreman_backends
         self._log = log
         self._router = APIRouter(
@@ -46,10 +74,48 @@ class ControllerApiV2Instances:
         self.router.add_api_route(
             "",
             self.search,
+            description=meta_filter_description,
+            response_model=ModelV2InstanceGetMulti,
+            response_class=ModelResponse,
+            response_model_exclude_unset=True,
+            methods=["GET"],
+        )
+        self.router.add_api_route(
+            "/_export",
+            self.export,
+            description=meta_filter_description,
+            response_class=StreamingResponse,
+            methods=["GET"],
+        )
+        self.router.add_api_route(
+            "/_events",
+            self.events,
+            description=meta_filter_description,
+            response_class=StreamingResponse,
+            methods=["GET"],
+        )
+        self.router.add_api_route(
+            "/_gc",
+            self.get_gc,
             response_model=ModelV2InstanceGetMulti,
+            response_class=ModelResponse,
             response_model_exclude_unset=True,
             methods=["GET"],
         )
+        self.router.add_api_route(
+            "/_mget",
+            self.mget,
+            response_model=ModelV2InstanceMget,
+            response_class=ModelResponse,
+            response_model_exclude_unset=True,
+            methods=["POST"],
+        )
+        self.router.add_api_route(
+            "/_replica",
+            self.get_replica,
+            response_model=ModelV2InstancesReplicaGet,
+            methods=["GET"],
+        )
         self.router.add_api_route(
             "/{instance_id}",
             self.create,
@@ -69,6 +135,7 @@ class ControllerApiV2Instances:
             "/{instance_id}",
             self.get,
             response_model=ModelV2InstanceGet,
+            response_class=ModelResponse,
             response_model_exclude_unset=True,
             methods=["GET"],
         )
@@ -84,10 +151,22 @@ class ControllerApiV2Instances:
     def authorize(self):
         return self._authorize
 
+    @property
+    def crud_audit(self):
+        return self._crud_audit
+
     @property
     def crud_instances(self):
         return self._crud_instances
 
+    @property
+    def crud_idempotency(self):
+        return self._crud_idempotency
+
+    @property
+    def crud_instances_gc(self):
+        return self._crud_instances_gc
+
     @property
     def crud_foreman_backends(self):
         return self._crud_foreman_backends
@@ -105,24 +184,79 @@ class ControllerApiV2Instances:
         data: ModelV2instancePost,
         instance_id: str,
         request: Request,
+        response: Response,
         fields: Set[filter_literal] = Query(default=filter_list),
+        idempotency_key: typing.Optional[str] = Header(
+            default=None,
+            max_length=255,
+            description="defaults to a hash of the instance id and payload",
+        ),
     ):
-        await self.authorize.require_permission(
+        user = await self.authorize.require_permission(
             request=request, permission="INSTANCE:POST"
         )
+        request_hash = self.crud_idempotency.request_hash(
+            {
+                "id": instance_id,
+                "payload": data.model_dump(mode="json"),
+                "fields": sorted(fields),
+            }
+        )
+
+        async def create_instance():
+            instance = await self._create(
+                user=user,
+                data=data,
+                instance_id=instance_id,
+                request=request,
+                fields=fields,
+            )
+            return instance.model_dump(exclude_unset=True)
 
+        result, replayed = await self.crud_idempotency.run(
+            key=f"instance:{instance_id}:{idempotency_key or request_hash}",
+            request_hash=request_hash,
+            resource_id=instance_id,
+            func=create_instance,
+        )
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return ModelV2InstanceGet.model_construct(**result)
+
+    async def _create(
+        self,
+        user: ModelV2UserGet,
+        data: ModelV2instancePost,
+        instance_id: str,
+        request: Request,
+        fields: Set[filter_literal],
+    ) -> ModelV2InstanceGet:
         instance = await self.crud_instances.create(
             _id=instance_id, payload=data, fields=list(fields)
         )
+        details = {"ip_address": str(data.ip_address)}
+        if instance.fqdn:
+            details["fqdn"] = instance.fqdn
+        await self.crud_audit.record(
+            actor=user.id,
+            action="create",
+            resource_type="instance",
+            resource_id=instance_id,
+            details=details,
+        )
         for foreman in self.crud_foreman_backends:
             try:
                 await foreman.create_dns(
                     fqdn=instance.fqdn,
                     ip_address=instance.ip_address,
                 )
-                await foreman.create_realm(
+                ipa_otp = await foreman.create_realm(
                     fqdn=instance.fqdn,
                 )
+                if ipa_otp:
+                    await self.crud_instances.update_ipa_otp(
+                        _id=instance_id, ipa_otp=ipa_otp, fields=["id"]
+                    )
             except BackendError as err:
                 self.log.error(
                     f"Failed to create DNS or realm for instance {instance_id} in foreman backend {foreman.name}"
@@ -135,45 +269,187 @@ class ControllerApiV2Instances:
         return instance
 
     async def delete(self, request: Request, instance_id: str):
-        await self.authorize.require_permission(
+        user = await self.authorize.require_permission(
             request=request, permission="INSTANCE:DELETE"
         )
-        instance = await self.crud_instances.get(
+        instance = await self.crud_instances.delete(
             _id=instance_id, fields=["fqdn", "ip_address"]
         )
+        await self.crud_idempotency.purge(resource_id=instance_id)
+        await self.crud_audit.record(
+            actor=user.id,
+            action="delete",
+            resource_type="instance",
+            resource_id=instance_id,
+            details={"fqdn": instance.fqdn, "ip_address": instance.ip_address},
+        )
         for foreman in self.crud_foreman_backends:
-            try:
-                await foreman.delete_dns(
-                    fqdn=instance.fqdn,
-                    ip_address=instance.ip_address,
-                )
-            except BackendError:
-                pass
-            try:
-                await foreman.delete_realm(
-                    fqdn=instance.fqdn,
+            await foreman.delete_instance(
+                fqdn=instance.fqdn,
+                ip_address=instance.ip_address,
+            )
+        return ModelV2DataDelete()
+
+    @staticmethod
+    def _meta_filter(request: Request) -> typing.Dict[str, typing.List[str]]:
+        meta = {}
+        for key in request.query_params.keys():
+            if not key.startswith("meta."):
+                continue
+            name = key[len("meta.") :]
+            if not name or name.startswith("$") or "." in name:
+                raise InvalidMetaFilter(key=key)
+            meta[name] = request.query_params.getlist(key)
+        return meta
+
+    @staticmethod
+    async def _events_sse(events: typing.AsyncIterator[typing.Optional[dict]]):
+        async for event in events:
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            message = ""
+            if "id" in event:
+                message += f"id: {event['id']}\n"
+            message += f"event: {event['event']}\n"
+            message += f"data: {json.dumps(event['data'], default=str)}\n\n"
+            yield message
+
+    async def events(
+        self,
+        request: Request,
+        dns_indicator: str = Query(
+            description="filter: regular_expressions", default=None
+        ),
+        subnet: ipaddress.IPv4Network = Query(
+            description="filter: IPv4 network in CIDR notation", default=None
+        ),
+        resume: str = Query(
+            default=None,
+            description="resume after this event id, alternative to the Last-Event-ID header",
+        ),
+    ):
+        await self.authorize.require_user(request=request)
+        meta = self._meta_filter(request=request)
+        return StreamingResponse(
+            self._events_sse(
+                self.crud_instances.events(
+                    dns_indicator=dns_indicator,
+                    meta=meta,
+                    subnet=subnet,
+                    resume_token=resume or request.headers.get("last-event-id"),
                 )
-            except BackendError:
-                pass
-        return await self.crud_instances.delete(_id=instance_id)
+            ),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def export(
+        self,
+        request: Request,
+        instance_id: str = Query(
+            description="filter: regular_expressions", default=None
+        ),
+        dns_indicator: str = Query(
+            description="filter: regular_expressions", default=None
+        ),
+        ip_address: str = Query(
+            description="filter: regular_expressions", default=None
+        ),
+        fqdn: str = Query(description="filter: regular_expressions", default=None),
+        subnet: ipaddress.IPv4Network = Query(
+            description="filter: IPv4 network in CIDR notation", default=None
+        ),
+        fields: Set[filter_literal] = Query(default=filter_list),
+        sort: sort_literal = Query(default="id"),
+        sort_order: sort_order_literal = Query(default="ascending"),
+    ):
+        await self.authorize.require_user(request=request)
+        fields.discard("ipa_otp")
+        meta = self._meta_filter(request=request)
+        return StreamingResponse(
+            self.crud_instances.export(
+                _id=instance_id,
+                dns_indicator=dns_indicator,
+                ip_address=ip_address,
+                fqdn=fqdn,
+                meta=meta,
+                subnet=subnet,
+                fields=list(fields),
+                sort=sort,
+                sort_order=sort_order,
+            ),
+            media_type="application/x-ndjson",
+        )
 
     async def get(
         self,
         instance_id: str,
         request: Request,
         fields: Set[filter_literal] = Query(default=filter_list),
+        wait: str = Query(
+            default=None,
+            pattern="^[0-9]+s?$",
+            description="long poll: hold the request for up to this many seconds, max 60s",
+        ),
+        until: Set[filter_literal] = Query(
+            default=None,
+            description="long poll: fields that must be set before returning",
+        ),
     ):
-        try:
-            await self.authorize.require_user(request=request)
+        client_ip = None
+        if await self.authorize.get_user_or_anonymous(request=request):
             fields.discard("ipa_otp")
-        except SessionCredentialError as err:
-            result = await self.crud_instances.get(
-                _id=instance_id, fields=["id", "ip_address"]
+        else:
+            client_ip = request.client.host
+
+        if wait:
+            instance, identity, version = await self.crud_instances.wait_versioned(
+                _id=instance_id,
+                fields=list(fields),
+                until=list(until or []),
+                timeout=min(int(wait.rstrip("s")), self.wait_max),
+                client_ip=client_ip,
             )
-            if result.ip_address != request.client.host:
-                raise err
+        else:
+            instance, identity, version = await self.crud_instances.get_versioned(
+                _id=instance_id, fields=list(fields), client_ip=client_ip
+            )
+        instance_etag = etag(identity=identity, version=version, fields=fields)
+        if etag_match(request=request, value=instance_etag):
+            return NotModifiedResponse(etag=instance_etag)
+        return ModelResponse(instance, headers={"ETag": instance_etag})
+
+    async def get_gc(
+        self,
+        request: Request,
+        limit: int = Query(
+            default=100,
+            ge=10,
+            le=1000,
+            description="maximum number of gc candidates to list",
+        ),
+    ):
+        await self.authorize.require_admin(request=request)
+        return ModelResponse(await self.crud_instances_gc.candidates(limit=limit))
 
-        return await self.crud_instances.get(_id=instance_id, fields=list(fields))
+    async def get_replica(self, request: Request):
+        await self.authorize.require_admin(request=request)
+        if not self.crud_instances.replica:
+            return ModelV2InstancesReplicaGet(enabled=False)
+        return ModelV2InstancesReplicaGet(**self.crud_instances.replica.stats())
+
+    async def mget(
+        self,
+        data: ModelV2InstanceMgetPost,
+        request: Request,
+        fields: Set[filter_literal] = Query(default=filter_list),
+    ):
+        await self.authorize.require_user(request=request)
+        fields.discard("ipa_otp")
+        return ModelResponse(
+            await self.crud_instances.mget(ids=data.ids, fields=list(fields))
+        )
 
     async def search(
         self,
@@ -188,6 +464,9 @@ class ControllerApiV2Instances:
             description="filter: regular_expressions", default=None
         ),
         fqdn: str = Query(description="filter: regular_expressions", default=None),
+        subnet: ipaddress.IPv4Network = Query(
+            description="filter: IPv4 network in CIDR notation", default=None
+        ),
         fields: Set[filter_literal] = Query(default=filter_list),
         sort: sort_literal = Query(default="id"),
         sort_order: sort_order_literal = Query(default="ascending"),
@@ -198,19 +477,34 @@ class ControllerApiV2Instances:
             le=1000,
             description="pagination limit, min value 10, max value 1000",
         ),
+        cursor: str = Query(
+            default=None,
+            description="pagination cursor, as returned in meta.next, takes precedence over page",
+        ),
+        count: count_literal = Query(
+            default="exact",
+            description="how meta.result_size is computed, none skips counting",
+        ),
     ):
         await self.authorize.require_user(request=request)
         fields.discard("ipa_otp")
-        return await self.crud_instances.search(
-            _id=instance_id,
-            dns_indicator=dns_indicator,
-            ip_address=ip_address,
-            fqdn=fqdn,
-            fields=list(fields),
-            sort=sort,
-            sort_order=sort_order,
-            page=page,
-            limit=limit,
+        meta = self._meta_filter(request=request)
+        return ModelResponse(
+            await self.crud_instances.search(
+                _id=instance_id,
+                dns_indicator=dns_indicator,
+                ip_address=ip_address,
+                fqdn=fqdn,
+                meta=meta,
+                subnet=subnet,
+                fields=list(fields),
+                sort=sort,
+                sort_order=sort_order,
+                page=page,
+                limit=limit,
+                cursor=cursor,
+                count=count,
+            )
         )
 
     async def update(
@@ -220,9 +514,16 @@ class ControllerApiV2Instances:
         request: Request,
         fields: Set[filter_literal] = Query(default=filter_list),
     ):
-        await self.authorize.require_permission(
+        user = await self.authorize.require_permission(
             request=request, permission="INSTANCE:POST"
         )
-        return await self.crud_instances.update(
+        result = await self.crud_instances.update(
             _id=instance_id, payload=data, fields=list(fields)
         )
+        await self.crud_audit.record(
+            actor=user.id,
+            action="update",
+            resource_type="instance",
+            resource_id=instance_id,
+        )
+        return result
@@ -0,0 +1,53 @@
+import logging
+
+from fastapi import APIRouter
+from fastapi import Request
+
+from catweazle.authorize import Authorize
+
+from catweazle.crud.ldap import CrudLdap
+
+from catweazle.model.v2.ldap import ModelV2LdapPoolGet
+
+
+class ControllerApiV2Ldap:
+    def __init__(
+        self,
+        log: logging.Logger,
+        authorize: Authorize,
+        crud_ldap: CrudLdap,
+    ):
+        self._authorize = authorize
+        self._crud_ldap = crud_ldap
+        self._log = log
+        self._router = APIRouter(
+            prefix="/ldap",
+            tags=["ldap"],
+        )
+
+        self.router.add_api_route(
+            "/pool",
+            self.get_pool,
+            response_model=ModelV2LdapPoolGet,
+            methods=["GET"],
+        )
+
+    @property
+    def authorize(self):
+        return self._authorize
+
+    @property
+    def crud_ldap(self):
+        return self._crud_ldap
+
+    @property
+    def log(self):
+        return self._log
+
+    @property
+    def router(self):
+        return self._router
+
+    async def get_pool(self, request: Request):
+        await self.authorize.require_admin(request=request)
+        return ModelV2LdapPoolGet(**self.crud_ldap.ldap_pool.stats())
@@ -7,9 +7,11 @@ from fastapi import Request
 
 from catweazle.authorize import Authorize
 
+from catweazle.crud.audit import CrudAudit
 from catweazle.crud.permissions import CrudPermissions
 from catweazle.crud.ldap import CrudLdap
 
+from catweazle.model.v2.common import count_literal
 from catweazle.model.v2.common import ModelV2DataDelete
 from catweazle.model.v2.common import sort_order_literal
 from catweazle.model.v2.permissions import filter_list
@@ -20,16 +22,20 @@ from catweazle.model.v2.permissions import ModelV2PermissionGetMulti
 from catweazle.model.v2.permissions import ModelV2PermissionPost
 from catweazle.model.v2.permissions import ModelV2PermissionPut
 
+from catweazle.response import ModelResponse
+
 
 class ControllerApiV2Permissions:
     def __init__(
         self,
         log: logging.Logger,
         authorize: Authorize,
+        crud_audit: CrudAudit,
         crud_permissions: CrudPermissions,
         crud_ldap: CrudLdap,
     ):
         self._authorize = authorize
+        self._crud_audit = crud_audit
         self._crud_permissions = crud_permissions
         self._crud_ldap = crud_ldap
         self._log = log
@@ -42,6 +48,7 @@ class ControllerApiV2Permissions:
             "",
             self.search,
             response_model=ModelV2PermissionGetMulti,
+            response_class=ModelResponse,
             response_model_exclude_unset=True,
             methods=["GET"],
         )
@@ -64,6 +71,7 @@ class ControllerApiV2Permissions:
             "/{permission_id}",
             self.get,
             response_model=ModelV2PermissionGet,
+            response_class=ModelResponse,
             response_model_exclude_unset=True,
             methods=["GET"],
         )
@@ -79,6 +87,10 @@ class ControllerApiV2Permissions:
     def authorize(self):
         return self._authorize
 
+    @property
+    def crud_audit(self):
+        return self._crud_audit
+
     @property
     def crud_permissions(self):
         return self._crud_permissions
@@ -102,26 +114,40 @@ class ControllerApiV2Permissions:
         permission_id: str,
         fields: Set[filter_literal] = Query(default=filter_list),
     ):
-        await self.authorize.require_admin(request=request)
+        user = await self.authorize.require_admin(request=request)
         if data.ldap_group:
             data.users = await self.crud_ldap.get_logins_from_group(
                 group=data.ldap_group
             )
-        return await self.crud_permissions.create(
+        result = await self.crud_permissions.create(
             _id=permission_id,
             payload=data,
             fields=list(fields),
         )
+        await self.crud_audit.record(
+            actor=user.id,
+            action="create",
+            resource_type="permission",
+            resource_id=permission_id,
+        )
+        return result
 
     async def delete(
         self,
         request: Request,
         permission_id: str,
     ):
-        await self.authorize.require_admin(request=request)
-        return await self.crud_permissions.delete(
+        user = await self.authorize.require_admin(request=request)
+        result = await self.crud_permissions.delete(
             _id=permission_id,
         )
+        await self.crud_audit.record(
+            actor=user.id,
+            action="delete",
+            resource_type="permission",
+            resource_id=permission_id,
+        )
+        return result
 
     async def get(
         self,
@@ -130,7 +156,9 @@ class ControllerApiV2Permissions:
         fields: Set[filter_literal] = Query(default=filter_list),
     ):
         await self.authorize.require_admin(request=request)
-        return await self.crud_permissions.get(_id=permission_id, fields=list(fields))
+        return ModelResponse(
+            await self.crud_permissions.get(_id=permission_id, fields=list(fields))
+        )
 
     async def search(
         self,
@@ -152,17 +180,29 @@ class ControllerApiV2Permissions:
             le=1000,
             description="pagination limit, min value 10, max value 1000",
         ),
+        cursor: str = Query(
+            default=None,
+            description="pagination cursor, as returned in meta.next, takes precedence over page",
+        ),
+        count: count_literal = Query(
+            default="exact",
+            description="how meta.result_size is computed, none skips counting",
+        ),
     ):
         await self.authorize.require_admin(request=request)
-        return await self.crud_permissions.search(
-            _id=permission_id,
-            ldap_group=ldap_group,
-            users=users,
-            fields=list(fields),
-            sort=sort,
-            sort_order=sort_order,
-            page=page,
-            limit=limit,
+        return ModelResponse(
+            await self.crud_permissions.search(
+                _id=permission_id,
+                ldap_group=ldap_group,
+                users=users,
+                fields=list(fields),
+                sort=sort,
+                sort_order=sort_order,
+                page=page,
+                limit=limit,
+                cursor=cursor,
+                count=count,
+            )
         )
 
     async def update(
@@ -172,7 +212,7 @@ class ControllerApiV2Permissions:
         request: Request,
         fields: Set[filter_literal] = Query(default=filter_list),
     ):
-        await self.authorize.require_admin(request=request)
+        user = await self.authorize.require_admin(request=request)
         current_group = await self.crud_permissions.get(
             _id=permission_id,
             fields=["ldap_group", "users"],
@@ -185,8 +225,15 @@ class ControllerApiV2Permissions:
             data.users = await self.crud_ldap.get_logins_from_group(
                 group=current_group.ldap_group
             )
-        return await self.crud_permissions.update(
+        result = await self.crud_permissions.update(
             _id=permission_id,
             payload=data,
             fields=list(fields),
         )
+        await self.crud_audit.record(
+            actor=user.id,
+            action="update",
+            resource_type="permission",
+            resource_id=permission_id,
+        )
+        return result
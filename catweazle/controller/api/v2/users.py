@@ -11,6 +11,7 @@ from catweazle.crud.permissions import CrudPermissions
 from catweazle.crud.users import CrudUsers
 from catweazle.crud.credentials import CrudCredentials
 
+from catweazle.model.v2.common import count_literal
 from catweazle.model.v2.common import ModelV2DataDelete
 from catweazle.model.v2.common import sort_order_literal
 from catweazle.model.v2.users import filter_list
@@ -21,6 +22,8 @@ from catweazle.model.v2.users import ModelV2UserGetMulti
 from catweazle.model.v2.users import ModelV2UserPost
 from catweazle.model.v2.users import ModelV2UserPut
 
+from catweazle.response import ModelResponse
+
 
 class ControllerApiV2Users:
     def __init__(
@@ -45,6 +48,7 @@ class ControllerApiV2Users:
             "",
             self.search,
             response_model=ModelV2UserGetMulti,
+            response_class=ModelResponse,
             response_model_exclude_unset=True,
             methods=["GET"],
         )
@@ -67,6 +71,7 @@ class ControllerApiV2Users:
             "/{user_id}",
             self.get,
             response_model=ModelV2UserGet,
+            response_class=ModelResponse,
             response_model_exclude_unset=True,
             methods=["GET"],
         )
@@ -131,7 +136,9 @@ class ControllerApiV2Users:
             user_id = user_id.id
         else:
             await self.authorize.require_admin(request=request)
-        return await self.crud_users.get(_id=user_id, fields=list(fields))
+        return ModelResponse(
+            await self.crud_users.get(_id=user_id, fields=list(fields))
+        )
 
     async def search(
         self,
@@ -147,15 +154,27 @@ class ControllerApiV2Users:
             le=1000,
             description="pagination limit, min value 10, max value 1000",
         ),
+        cursor: str = Query(
+            default=None,
+            description="pagination cursor, as returned in meta.next, takes precedence over page",
+        ),
+        count: count_literal = Query(
+            default="exact",
+            description="how meta.result_size is computed, none skips counting",
+        ),
     ):
         await self.authorize.require_admin(request=request)
-        return await self.crud_users.search(
-            _id=user_id,
-            fields=list(fields),
-            sort=sort,
-            sort_order=sort_order,
-            page=page,
-            limit=limit,
+        return ModelResponse(
+            await self.crud_users.search(
+                _id=user_id,
+                fields=list(fields),
+                sort=sort,
+                sort_order=sort_order,
+                page=page,
+                limit=limit,
+                cursor=cursor,
+                count=count,
+            )
         )
 
     async def update(
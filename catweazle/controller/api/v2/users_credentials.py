@@ -7,9 +7,11 @@ from fastapi import Request
 
 from catweazle.authorize import Authorize
 
+from catweazle.crud.audit import CrudAudit
 from catweazle.crud.credentials import CrudCredentials
 from catweazle.crud.users import CrudUsers
 
+from catweazle.model.v2.common import count_literal
 from catweazle.model.v2.common import ModelV2DataDelete
 from catweazle.model.v2.common import sort_order_literal
 from catweazle.model.v2.credentials import filter_list
@@ -21,16 +23,20 @@ from catweazle.model.v2.credentials import ModelV2CredentialPost
 from catweazle.model.v2.credentials import ModelV2CredentialPostResult
 from catweazle.model.v2.credentials import ModelV2CredentialPut
 
+from catweazle.response import ModelResponse
+
 
 class ControllerApiV2UsersCredentials:
     def __init__(
         self,
         log: logging.Logger,
         authorize: Authorize,
+        crud_audit: CrudAudit,
         crud_users: CrudUsers,
         crud_users_credentials: CrudCredentials,
     ):
         self._authorize = authorize
+        self._crud_audit = crud_audit
         self._crud_users = crud_users
         self._crud_users_credentials = crud_users_credentials
         self._log = log
@@ -51,6 +57,7 @@ class ControllerApiV2UsersCredentials:
             "",
             self.search,
             response_model=ModelV2CredentialGetMulti,
+            response_class=ModelResponse,
             response_model_exclude_unset=True,
             methods=["GET"],
         )
@@ -65,6 +72,7 @@ class ControllerApiV2UsersCredentials:
             "/{credential_id}",
             self.get,
             response_model=ModelV2CredentialGet,
+            response_class=ModelResponse,
             response_model_exclude_unset=True,
             methods=["GET"],
         )
@@ -76,6 +84,10 @@ class ControllerApiV2UsersCredentials:
             methods=["PUT"],
         )
 
+    @property
+    def crud_audit(self):
+        return self._crud_audit
+
     @property
     def authorize(self):
         return self._authorize
@@ -106,12 +118,20 @@ class ControllerApiV2UsersCredentials:
             user = await self.authorize.get_user(request=request)
             user_id = user.id
         else:
-            await self.authorize.require_admin(request=request)
+            user = await self.authorize.require_admin(request=request)
         await self.crud_users.resource_exists(_id=user_id)
-        return await self.crud_users_credentials.create(
+        result = await self.crud_users_credentials.create(
             owner=user_id,
             payload=data,
         )
+        await self.crud_audit.record(
+            actor=user.id,
+            action="create",
+            resource_type="credential",
+            resource_id=result.id,
+            details={"owner": user_id},
+        )
+        return result
 
     async def delete(
         self,
@@ -123,10 +143,18 @@ class ControllerApiV2UsersCredentials:
             user = await self.authorize.get_user(request=request)
             user_id = user.id
         else:
-            await self.authorize.require_admin(request=request)
-        return await self.crud_users_credentials.delete(
+            user = await self.authorize.require_admin(request=request)
+        result = await self.crud_users_credentials.delete(
             _id=credential_id, owner=user_id
         )
+        await self.crud_audit.record(
+            actor=user.id,
+            action="delete",
+            resource_type="credential",
+            resource_id=credential_id,
+            details={"owner": user_id},
+        )
+        return result
 
     async def get(
         self,
@@ -140,8 +168,10 @@ class ControllerApiV2UsersCredentials:
             user_id = user.id
         else:
             await self.authorize.require_admin(request=request)
-        return await self.crud_users_credentials.get(
-            owner=user_id, _id=credential_id, fields=list(fields)
+        return ModelResponse(
+            await self.crud_users_credentials.get(
+                owner=user_id, _id=credential_id, fields=list(fields)
+            )
         )
 
     async def search(
@@ -158,6 +188,14 @@ class ControllerApiV2UsersCredentials:
             le=1000,
             description="pagination limit, min value 10, max value 1000",
         ),
+        cursor: str = Query(
+            default=None,
+            description="pagination cursor, as returned in meta.next, takes precedence over page",
+        ),
+        count: count_literal = Query(
+            default="exact",
+            description="how meta.result_size is computed, none skips counting",
+        ),
     ):
         if user_id == "_self":
             user = await self.authorize.get_user(request=request)
@@ -171,8 +209,10 @@ class ControllerApiV2UsersCredentials:
             sort_order=sort_order,
             page=page,
             limit=limit,
+            cursor=cursor,
+            count=count,
         )
-        return result
+        return ModelResponse(result)
 
     async def update(
         self,
@@ -186,7 +226,15 @@ class ControllerApiV2UsersCredentials:
             user = await self.authorize.get_user(request=request)
             user_id = user.id
         else:
-            await self.authorize.require_admin(request=request)
-        return await self.crud_users_credentials.update(
+            user = await self.authorize.require_admin(request=request)
+        result = await self.crud_users_credentials.update(
             _id=credential_id, owner=user_id, payload=data, fields=list(fields)
         )
+        await self.crud_audit.record(
+            actor=user.id,
+            action="update",
+            resource_type="credential",
+            resource_id=credential_id,
+            details={"owner": user_id},
+        )
+        return result
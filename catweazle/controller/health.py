@@ -0,0 +1,64 @@
+import logging
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from catweazle.crud.health import CrudHealth
+
+from catweazle.model.health import ModelHealthLiveGet
+from catweazle.model.health import ModelHealthReadyGet
+
+
+class ControllerHealth:
+    def __init__(
+        self,
+        log: logging.Logger,
+        crud_health: CrudHealth,
+    ):
+        self._crud_health = crud_health
+        self._log = log
+        self._router = APIRouter(
+            prefix="/health",
+            tags=["health"],
+        )
+
+        self.router.add_api_route(
+            "/live",
+            self.get_live,
+            response_model=ModelHealthLiveGet,
+            responses={503: {"model": ModelHealthLiveGet}},
+            methods=["GET"],
+        )
+        self.router.add_api_route(
+            "/ready",
+            self.get_ready,
+            response_model=ModelHealthReadyGet,
+            responses={503: {"model": ModelHealthReadyGet}},
+            methods=["GET"],
+        )
+
+    @property
+    def crud_health(self):
+        return self._crud_health
+
+    @property
+    def log(self):
+        return self._log
+
+    @property
+    def router(self):
+        return self._router
+
+    async def get_live(self):
+        result = self.crud_health.live()
+        return JSONResponse(
+            status_code=200 if result.live else 503,
+            content=result.model_dump(),
+        )
+
+    async def get_ready(self):
+        result = self.crud_health.ready()
+        return JSONResponse(
+            status_code=200 if result.ready else 503,
+            content=result.model_dump(),
+        )
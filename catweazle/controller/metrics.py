@@ -0,0 +1,39 @@
+import logging
+
+from fastapi import APIRouter
+from starlette.responses import Response
+
+import catweazle.metrics
+
+
+class ControllerMetrics:
+    def __init__(
+        self,
+        log: logging.Logger,
+    ):
+        self._log = log
+        self._router = APIRouter(
+            tags=["metrics"],
+        )
+
+        self.router.add_api_route(
+            "/metrics",
+            self.get,
+            methods=["GET"],
+            include_in_schema=False,
+        )
+
+    @property
+    def log(self):
+        return self._log
+
+    @property
+    def router(self):
+        return self._router
+
+    @staticmethod
+    async def get():
+        return Response(
+            content=catweazle.metrics.render(),
+            media_type=catweazle.metrics.content_type,
+        )
@@ -0,0 +1,211 @@
+import asyncio
+from datetime import datetime
+from datetime import UTC
+import logging
+import typing
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+import pymongo
+import pymongo.errors
+
+from catweazle.crud.common import CrudMongo
+
+from catweazle.model.v2.audit import ModelV2AuditGet
+from catweazle.model.v2.audit import ModelV2AuditGetMulti
+from catweazle.model.v2.common import count_literal
+from catweazle.model.v2.common import sort_order_literal
+
+
+class CrudAudit(CrudMongo):
+    indexes_required = (pymongo.IndexModel([("timestamp", pymongo.ASCENDING)]),)
+    indexes_recommended = (
+        pymongo.IndexModel(
+            [
+                ("actor", pymongo.ASCENDING),
+                ("timestamp", pymongo.DESCENDING),
+                ("_id", pymongo.DESCENDING),
+            ]
+        ),
+        pymongo.IndexModel(
+            [
+                ("resource_type", pymongo.ASCENDING),
+                ("resource_id", pymongo.ASCENDING),
+                ("timestamp", pymongo.DESCENDING),
+                ("_id", pymongo.DESCENDING),
+            ]
+        ),
+    )
+    index_ttl_field = "timestamp"
+    unique_fields = ()
+
+    def __init__(
+        self,
+        log: logging.Logger,
+        coll: AsyncIOMotorCollection,
+        retention: int,
+        queue_size: int,
+        batch_size: int,
+        flush_interval: float,
+        block_timeout: float,
+        search_read_preference: typing.Optional[str] = None,
+    ):
+        super(CrudAudit, self).__init__(
+            log=log,
+            coll=coll,
+            search_read_preference=search_read_preference,
+            index_ttl=retention,
+        )
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._block_timeout = block_timeout
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._writer_task = None
+
+    async def _flush(self, batch: typing.List[dict]) -> None:
+        try:
+            with self._operation("flush"):
+                await self.coll.insert_many(batch, ordered=False)
+            self._written += len(batch)
+        except pymongo.errors.BulkWriteError as err:
+            inserted = err.details.get("nInserted", 0)
+            self._written += inserted
+            self._failed += len(batch) - inserted
+            self.log.error(f"audit log write partially failed: {err}")
+        except pymongo.errors.PyMongoError as err:
+            self._failed += len(batch)
+            self.log.error(f"audit log write failed: {err}")
+
+    async def _writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self._flush_interval
+                while len(batch) < self._batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(
+                            await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                        )
+                    except asyncio.TimeoutError:
+                        break
+                await self._flush(batch)
+                batch = []
+        except asyncio.CancelledError:
+            if batch:
+                await self._flush(batch)
+            raise
+
+    def writer_background(self) -> asyncio.Task:
+        self._writer_task = asyncio.create_task(self._writer())
+        return self._writer_task
+
+    async def close(self) -> None:
+        if self._writer_task:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+            if len(batch) >= self._batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+    async def record(
+        self,
+        actor: str,
+        action: str,
+        resource_type: str,
+        resource_id: str,
+        details: typing.Optional[typing.Dict[str, str]] = None,
+    ) -> None:
+        event = {
+            "timestamp": datetime.now(UTC),
+            "actor": actor,
+            "action": action,
+            "resource_type": resource_type,
+            "resource_id": resource_id,
+        }
+        if details:
+            event["details"] = details
+        try:
+            self._queue.put_nowait(event)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self._block_timeout:
+            try:
+                await asyncio.wait_for(
+                    self._queue.put(event), timeout=self._block_timeout
+                )
+                return
+            except asyncio.TimeoutError:
+                pass
+        if not self._dropped % 1000:
+            self.log.warning(
+                f"audit log queue full, dropping events, dropped so far: {self._dropped}"
+            )
+        self._dropped += 1
+
+    async def search(
+        self,
+        actor: typing.Optional[str] = None,
+        action: typing.Optional[str] = None,
+        resource_type: typing.Optional[str] = None,
+        resource_id: typing.Optional[str] = None,
+        since: typing.Optional[datetime] = None,
+        until: typing.Optional[datetime] = None,
+        fields: typing.Optional[list] = None,
+        sort: typing.Optional[str] = None,
+        sort_order: typing.Optional[sort_order_literal] = None,
+        page: typing.Optional[int] = None,
+        limit: typing.Optional[int] = None,
+        cursor: typing.Optional[str] = None,
+        count: count_literal = "exact",
+    ) -> ModelV2AuditGetMulti:
+        query = {}
+        self._filter_literal(query, "actor", actor)
+        self._filter_literal(query, "action", action)
+        self._filter_literal(query, "resource_type", resource_type)
+        self._filter_literal(query, "resource_id", resource_id)
+        if since or until:
+            query["timestamp"] = {}
+            if since:
+                query["timestamp"]["$gte"] = since
+            if until:
+                query["timestamp"]["$lt"] = until
+
+        result = await self._search(
+            query=query,
+            fields=fields,
+            sort=sort,
+            sort_order=sort_order,
+            page=page,
+            limit=limit,
+            cursor=cursor,
+            count=count,
+        )
+        for item in result["result"]:
+            if "timestamp" in item:
+                item["timestamp"] = str(item["timestamp"])
+        return self._format_model_multi(ModelV2AuditGetMulti, ModelV2AuditGet, result)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "written": self._written,
+            "dropped": self._dropped,
+            "failed": self._failed,
+        }
@@ -1,13 +1,22 @@
+import asyncio
+import contextlib
 import logging
 import typing
 
 from bson.objectid import ObjectId
 from motor.motor_asyncio import AsyncIOMotorCollection
+from opentelemetry.trace import SpanKind
 import pymongo
 import pymongo.errors
+from pymongo.read_preferences import make_read_preference
+from pymongo.read_preferences import read_pref_mode_from_name
+
+import catweazle.metrics
+import catweazle.tracing
 
 from catweazle.crud.mixins import FilterMixIn
 from catweazle.crud.mixins import Format
+from catweazle.crud.mixins import PaginationCursorMixIn
 from catweazle.crud.mixins import PaginationSkipMixIn
 from catweazle.crud.mixins import ProjectionMixIn
 from catweazle.crud.mixins import SortMixIn
@@ -27,50 +36,252 @@ class Crud:
 
 
 class CrudMongo(
-    Crud, FilterMixIn, Format, PaginationSkipMixIn, ProjectionMixIn, SortMixIn
+    Crud,
+    FilterMixIn,
+    Format,
+    PaginationCursorMixIn,
+    PaginationSkipMixIn,
+    ProjectionMixIn,
+    SortMixIn,
 ):
-    def __init__(self, log: logging.Logger, coll: AsyncIOMotorCollection):
+    export_batch_size = 1000
+    indexes_required: typing.Tuple[pymongo.IndexModel, ...] = ()
+    indexes_recommended: typing.Tuple[pymongo.IndexModel, ...] = ()
+    index_ttl_field: typing.Optional[str] = None
+    unique_fields = ("id",)
+    versioned = False
+
+    def __init__(
+        self,
+        log: logging.Logger,
+        coll: AsyncIOMotorCollection,
+        search_read_preference: typing.Optional[str] = None,
+        index_ttl: typing.Optional[int] = None,
+    ):
         super().__init__(log)
         self._resource_type = coll.name
         self._coll = coll
+        self._coll_search = coll
+        if search_read_preference:
+            self._coll_search = coll.with_options(
+                read_preference=make_read_preference(
+                    read_pref_mode_from_name(search_read_preference), None
+                )
+            )
+        self._index_task = None
+        self._index_ttl = index_ttl
 
     @property
     def coll(self):
         return self._coll
 
+    @property
+    def coll_search(self):
+        return self._coll_search
+
+    @property
+    def index_build_running(self) -> bool:
+        return self._index_task is not None and not self._index_task.done()
+
     @property
     def resource_type(self):
         return self._resource_type
 
+    @contextlib.contextmanager
+    def _operation(self, operation: str, current: bool = True):
+        with catweazle.tracing.span(
+            f"mongodb {self.resource_type}.{operation}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "db.system": "mongodb",
+                "db.collection.name": self.resource_type,
+                "db.operation.name": operation,
+            },
+            current=current,
+        ):
+            with catweazle.metrics.mongodb_operation_duration.labels(
+                self.resource_type, operation
+            ).time():
+                yield
+
+    @staticmethod
+    def _index_key(key) -> tuple:
+        return tuple((field, int(direction)) for field, direction in key)
+
+    async def _index_live(self) -> dict:
+        result = {}
+        for name, spec in (await self.coll.index_information()).items():
+            result[self._index_key(spec["key"])] = dict(spec, name=name)
+        return result
+
+    def _index_model(self, index: pymongo.IndexModel) -> pymongo.IndexModel:
+        document = dict(index.document)
+        keys = list(document.pop("key").items())
+        if self._index_ttl is None or keys != [(self.index_ttl_field, 1)]:
+            return index
+        document["expireAfterSeconds"] = self._index_ttl
+        return pymongo.IndexModel(keys, **document)
+
+    async def _index_ttl_update(self, index: pymongo.IndexModel, spec: dict) -> None:
+        expire = index.document.get("expireAfterSeconds")
+        if expire is None or spec.get("expireAfterSeconds") == expire:
+            return
+        self.log.info(
+            f"updating {self.resource_type} index {spec['name']} expireAfterSeconds "
+            f"from {spec.get('expireAfterSeconds')} to {expire}"
+        )
+        try:
+            await self.coll.database.command(
+                "collMod",
+                self.coll.name,
+                index={"name": spec["name"], "expireAfterSeconds": expire},
+            )
+        except pymongo.errors.OperationFailure as err:
+            self.log.error(
+                f"updating {self.resource_type} index {spec['name']} failed: {err}"
+            )
+
+    async def _index_report(self, live: dict) -> None:
+        managed = {self._index_key([("_id", 1)])}
+        for index in self.indexes_required + self.indexes_recommended:
+            managed.add(self._index_key(index.document["key"].items()))
+        for key, spec in live.items():
+            if key not in managed:
+                self.log.warning(
+                    f"{self.resource_type} index {spec['name']} is not managed by catweazle"
+                )
+        names = {spec["name"] for spec in live.values()}
+        try:
+            async for stat in self.coll.aggregate([{"$indexStats": {}}]):
+                if stat["name"] not in names or stat["name"] == "_id_":
+                    continue
+                if stat["accesses"]["ops"] == 0:
+                    self.log.warning(
+                        f"{self.resource_type} index {stat['name']} unused since {stat['accesses']['since']}"
+                    )
+        except pymongo.errors.OperationFailure as err:
+            self.log.info(f"{self.resource_type} index usage not available: {err}")
+
+    async def _index_create(
+        self,
+        indexes: typing.Tuple[pymongo.IndexModel, ...],
+        live: dict,
+        required: bool,
+    ) -> None:
+        for index in indexes:
+            index = self._index_model(index)
+            key = self._index_key(index.document["key"].items())
+            if key in live:
+                await self._index_ttl_update(index=index, spec=live[key])
+                continue
+            self.log.info(
+                f"creating {self.resource_type} index {index.document['name']}"
+            )
+            try:
+                await self.coll.create_indexes([index])
+            except pymongo.errors.OperationFailure as err:
+                self.log.error(
+                    f"creating {self.resource_type} index {index.document['name']} failed: {err}"
+                )
+                if required:
+                    raise
+
+    async def index_create_required(self) -> None:
+        if not self.indexes_required:
+            return
+        self.log.info(f"creating {self.resource_type} required indices")
+        live = await self._index_live()
+        await self._index_create(self.indexes_required, live=live, required=True)
+        self.log.info(f"creating {self.resource_type} required indices, done")
+
+    async def index_create_recommended(self) -> None:
+        self.log.info(f"creating {self.resource_type} recommended indices")
+        try:
+            live = await self._index_live()
+            await self._index_create(
+                self.indexes_recommended, live=live, required=False
+            )
+            await self._index_report(live=live)
+        except pymongo.errors.ConnectionFailure as err:
+            self.log.error(f"backend error: {err}")
+            return
+        self.log.info(f"creating {self.resource_type} recommended indices, done")
+
+    def index_create_background(self) -> asyncio.Task:
+        self._index_task = asyncio.create_task(self.index_create_recommended())
+        return self._index_task
+
     async def _create(
         self,
         payload: dict,
         fields: list = None,
     ) -> dict:
+        if self.versioned:
+            payload["version"] = 1
         try:
-            _id = await self._coll.insert_one(payload)
-            return await self._get_by_obj_id(_id=_id.inserted_id, fields=fields)
+            with self._operation("create"):
+                await self._coll.insert_one(payload)
         except pymongo.errors.DuplicateKeyError:
             raise DuplicateResource
         except pymongo.errors.ConnectionFailure as err:
             self.log.error(f"backend error: {err}")
             raise BackendError()
+        if fields:
+            result = {k: payload[k] for k in fields if k in payload}
+        else:
+            result = dict(payload)
+        return self._format(result)
 
-    async def _delete(self, query: dict) -> dict:
+    async def _delete(self, query: dict, fields: list = None) -> dict:
         try:
-            result = await self._coll.delete_one(filter=query)
+            with self._operation("delete"):
+                result = await self._coll.find_one_and_delete(
+                    filter=query,
+                    projection=self._projection(fields) or {"_id": 1},
+                )
         except pymongo.errors.ConnectionFailure as err:
             self.log.error(f"backend error: {err}")
             raise BackendError()
-        if result.deleted_count == 0:
+        if result is None:
             raise ResourceNotFound
-        return {}
+        return self._format(result)
 
-    async def _get(self, query: dict, fields: list) -> dict:
-        try:
-            result = await self._coll.find_one(
-                filter=query, projection=self._projection(fields)
+    async def _export(
+        self,
+        query: dict,
+        fields: typing.Optional[list] = None,
+        sort: typing.Optional[str] = None,
+        sort_order: typing.Optional[str] = None,
+    ) -> typing.AsyncIterator[dict]:
+        db_cursor = self.coll_search.find(
+            filter=query,
+            projection=self._projection(fields),
+            batch_size=self.export_batch_size,
+        )
+        if sort and sort_order:
+            db_cursor.sort(
+                self._sort(
+                    sort=sort,
+                    sort_order=sort_order,
+                    tiebreaker=sort not in self.unique_fields,
+                )
             )
+        try:
+            with self._operation("export", current=False):
+                async for item in db_cursor:
+                    yield self._format(item)
+        except pymongo.errors.ConnectionFailure as err:
+            self.log.error(f"backend error: {err}")
+            raise BackendError
+        finally:
+            await db_cursor.close()
+
+    async def _get(self, query: dict, fields: list, raw: bool = False) -> dict:
+        try:
+            with self._operation("get"):
+                result = await self._coll.find_one(
+                    filter=query, projection=self._projection(fields)
+                )
         except pymongo.errors.ConnectionFailure as err:
             self.log.error(f"backend error: {err}")
             raise BackendError
@@ -80,6 +291,8 @@ class CrudMongo(
             raise ResourceNotFound(
                 details=f"Resource {self.resource_type} {query} not found"
             )
+        if raw:
+            return result
         return self._format(result)
 
     async def _get_by_obj_id(self, _id, fields: list) -> dict:
@@ -98,21 +311,68 @@ class CrudMongo(
         sort_order: typing.Optional[str] = None,
         page: typing.Optional[int] = None,
         limit: typing.Optional[int] = None,
+        cursor: typing.Optional[str] = None,
+        count: str = "exact",
+        primary: bool = False,
     ) -> dict:
+        coll = self.coll if primary else self.coll_search
+        unique = sort in self.unique_fields
+        projection = self._projection(fields)
+        if projection and sort:
+            projection[sort] = 1
         try:
-            count = await self._coll.count_documents(
-                filter=query,
-            )
-            cursor = self._coll.find(filter=query, projection=self._projection(fields))
+            find_query = query
+            if cursor and sort and sort_order:
+                value, _id = self._pagination_cursor_decode(
+                    cursor=cursor, sort=sort, sort_order=sort_order
+                )
+                find_query = {
+                    "$and": [
+                        query,
+                        self._pagination_cursor_query(
+                            sort=sort,
+                            sort_order=sort_order,
+                            value=value,
+                            _id=_id,
+                            unique=unique,
+                        ),
+                    ]
+                }
+            if count == "estimated" and not query:
+                count_job = coll.estimated_document_count()
+            elif count in ("exact", "estimated"):
+                count_job = coll.count_documents(filter=query)
+            else:
+                count_job = None
+            db_cursor = coll.find(filter=find_query, projection=projection)
             if sort and sort_order:
-                cursor.sort(self._sort(sort=sort, sort_order=sort_order))
-            if page and limit:
-                cursor.skip(self._pagination_skip(page, limit))
-                cursor.limit(limit)
-            return self._format_multi(list(await cursor.to_list(limit)), count=count)
+                db_cursor.sort(
+                    self._sort(sort=sort, sort_order=sort_order, tiebreaker=not unique)
+                )
+            if limit:
+                if page and not cursor:
+                    db_cursor.skip(self._pagination_skip(page, limit))
+                db_cursor.limit(limit)
+            with self._operation("search"):
+                if count_job:
+                    result, count = await asyncio.gather(
+                        db_cursor.to_list(limit), count_job
+                    )
+                else:
+                    result, count = await db_cursor.to_list(limit), None
         except pymongo.errors.ConnectionFailure as err:
             self.log.error(f"backend error: {err}")
             raise BackendError
+        next_cursor = None
+        if limit and sort and sort_order and len(result) == limit:
+            next_cursor = self._pagination_cursor_encode(
+                item=result[-1], sort=sort, sort_order=sort_order
+            )
+        for item in result:
+            self._format(item)
+            if fields and sort not in fields:
+                item.pop(sort, None)
+        return self._format_multi(result, count=count, next_cursor=next_cursor)
 
     async def _update(
         self, query: dict, payload: dict, fields: list, upsert=False
@@ -122,14 +382,17 @@ class CrudMongo(
             if v is None:
                 continue
             update["$set"][k] = v
+        if self.versioned:
+            update["$inc"] = {"version": 1}
         try:
-            result = await self._coll.find_one_and_update(
-                filter=query,
-                update=update,
-                projection=self._projection(fields=fields),
-                return_document=pymongo.ReturnDocument.AFTER,
-                upsert=upsert,
-            )
+            with self._operation("update"):
+                result = await self._coll.find_one_and_update(
+                    filter=query,
+                    update=update,
+                    projection=self._projection(fields=fields),
+                    return_document=pymongo.ReturnDocument.AFTER,
+                    upsert=upsert,
+                )
         except pymongo.errors.ConnectionFailure as err:
             self.log.error(f"backend error: {err}")
             raise BackendError
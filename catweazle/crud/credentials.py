@@ -11,11 +11,14 @@ from motor.motor_asyncio import AsyncIOMotorCollection
 from passlib.hash import pbkdf2_sha512
 import pymongo
 
+import catweazle.metrics
+
 from catweazle.crud.common import CrudMongo
 
 from catweazle.errors import CredentialError
 from catweazle.errors import ResourceNotFound
 
+from catweazle.model.v2.common import count_literal
 from catweazle.model.v2.common import ModelV2DataDelete
 from catweazle.model.v2.common import sort_order_literal
 from catweazle.model.v2.credentials import ModelV2CredentialGet
@@ -26,20 +29,36 @@ from catweazle.model.v2.credentials import ModelV2CredentialPut
 
 
 class CrudCredentials(CrudMongo):
-    def __init__(self, log: logging.Logger, coll: AsyncIOMotorCollection):
-        super(CrudCredentials, self).__init__(log=log, coll=coll)
+    indexes_required = (
+        pymongo.IndexModel(
+            [("id", pymongo.ASCENDING), ("owner", pymongo.ASCENDING)], unique=True
+        ),
+    )
+    indexes_recommended = (
+        pymongo.IndexModel([("owner", pymongo.ASCENDING), ("id", pymongo.ASCENDING)]),
+        pymongo.IndexModel(
+            [
+                ("owner", pymongo.ASCENDING),
+                ("created", pymongo.ASCENDING),
+                ("_id", pymongo.ASCENDING),
+            ]
+        ),
+    )
+
+    def __init__(
+        self,
+        log: logging.Logger,
+        coll: AsyncIOMotorCollection,
+        search_read_preference: typing.Optional[str] = None,
+    ):
+        super(CrudCredentials, self).__init__(
+            log=log, coll=coll, search_read_preference=search_read_preference
+        )
 
     @staticmethod
     def _create_secret(token) -> str:
         return pbkdf2_sha512.encrypt(str(token), rounds=10, salt_size=32)
 
-    async def index_create(self) -> None:
-        self.log.info(f"creating {self.resource_type} indices")
-        await self.coll.create_index(
-            [("id", pymongo.ASCENDING), ("owner", pymongo.ASCENDING)], unique=True
-        )
-        self.log.info(f"creating {self.resource_type} indices, done")
-
     async def check_credential(self, request: Request):
         x_secret = request.headers.get("x-secret")
         x_secret_id = request.headers.get("x-secret-id")
@@ -50,7 +69,9 @@ class CrudCredentials(CrudMongo):
 
         result = await self._get(query=query, fields=["secret", "owner"])
 
-        if not pbkdf2_sha512.verify(x_secret, result["secret"]):
+        with catweazle.metrics.pbkdf2_verify_duration.labels("credential").time():
+            valid = pbkdf2_sha512.verify(x_secret, result["secret"])
+        if not valid:
             raise CredentialError
 
         return result["owner"]
@@ -98,8 +119,8 @@ class CrudCredentials(CrudMongo):
         result = await self._get(query=query, fields=fields)
         if "created" in result:
             result["created"] = str(result["created"])
-        self.log.info(result)
-        return ModelV2CredentialGet(**result)
+        self.log.debug("%s", result)
+        return ModelV2CredentialGet.model_construct(**result)
 
     async def search(
         self,
@@ -109,6 +130,8 @@ class CrudCredentials(CrudMongo):
         sort_order: typing.Optional[sort_order_literal] = None,
         page: typing.Optional[int] = None,
         limit: typing.Optional[int] = None,
+        cursor: typing.Optional[str] = None,
+        count: count_literal = "exact",
     ) -> ModelV2CredentialGetMulti:
         query = {"owner": owner}
 
@@ -119,12 +142,16 @@ class CrudCredentials(CrudMongo):
             sort_order=sort_order,
             page=page,
             limit=limit,
+            cursor=cursor,
+            count=count,
         )
         for item in result["result"]:
             if "created" in item:
                 item["created"] = str(item["created"])
-        self.log.info(result)
-        return ModelV2CredentialGetMulti(**result)
+        self.log.debug("%s", result)
+        return self._format_model_multi(
+            ModelV2CredentialGetMulti, ModelV2CredentialGet, result
+        )
 
     async def update(
         self, _id: str, owner: str, payload: ModelV2CredentialPut, fields: list
@@ -134,4 +161,4 @@ class CrudCredentials(CrudMongo):
         result = await self._update(query=query, fields=fields, payload=data)
         if "created" in result:
             result["created"] = str(result["created"])
-        return ModelV2CredentialGet(**result)
+        return ModelV2CredentialGet.model_construct(**result)
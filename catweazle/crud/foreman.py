@@ -3,10 +3,14 @@ from typing import List
 import ssl
 import sys
 
+import catweazle.metrics
+import catweazle.tracing
+
 from catweazle.errors import BackendError
 
 import httpx
 import ipaddress
+from opentelemetry.trace import SpanKind
 from pydantic.networks import IPv4Network
 
 
@@ -45,13 +49,18 @@ class CrudForeman:
                 context.load_verify_locations(cafile=self.ssl_ca)
             except OSError as err:
                 self.log.error(
-                    f"{self.name}:foreman: could not create ssl context: {err}"
+                    "%s:foreman: could not create ssl context: %s",
+                    self.name,
+                    err,
                 )
                 sys.exit(1)
             self._http = httpx.AsyncClient(verify=context, timeout=30)
         else:
             self._http = httpx.AsyncClient(timeout=30)
 
+    async def close(self):
+        await self._http.aclose()
+
     @property
     def log(self):
         return self._log
@@ -100,18 +109,47 @@ class CrudForeman:
     def http(self) -> httpx.AsyncClient:
         return self._http
 
-    async def request_delete(self, url):
+    async def ping(self) -> None:
+        resp = await self.http.get(f"{self.url}/features")
+        if resp.status_code != 200:
+            raise BackendError()
+
+    def _request_span(self, method, url, record_type):
+        return catweazle.tracing.span(
+            f"foreman {method} {record_type}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "http.request.method": method,
+                "url.full": url,
+                "catweazle.foreman.backend": self.name,
+                "catweazle.foreman.record_type": record_type,
+            },
+        )
+
+    async def request_delete(self, url, record_type):
         url = f"{self.url}{url}"
-        resp = await self.http.delete(url)
-        self.log.info(f"{self.name}:foreman: request_delete: {url}")
+        with self._request_span("DELETE", url, record_type) as span:
+            with catweazle.metrics.foreman_request_duration.labels(
+                self.name, "delete", record_type
+            ).time():
+                resp = await self.http.delete(url, headers=catweazle.tracing.inject())
+            span.set_attribute("http.response.status_code", resp.status_code)
+        self.log.debug("%s:foreman: request_delete: %s", self.name, url)
         if resp.status_code != 200:
             self.log.error(resp.text)
             raise BackendError()
 
-    async def request_post(self, url, data):
+    async def request_post(self, url, data, record_type):
         url = f"{self.url}{url}"
-        resp = await self.http.post(url, data=data)
-        self.log.info(f"{self.name}:foreman: request_post: {url} {data}")
+        with self._request_span("POST", url, record_type) as span:
+            with catweazle.metrics.foreman_request_duration.labels(
+                self.name, "post", record_type
+            ).time():
+                resp = await self.http.post(
+                    url, data=data, headers=catweazle.tracing.inject()
+                )
+            span.set_attribute("http.response.status_code", resp.status_code)
+        self.log.debug("%s:foreman: request_post: %s %s", self.name, url, data)
         if resp.status_code != 200:
             self.log.error(resp.text)
             raise BackendError()
@@ -129,10 +167,13 @@ class CrudForeman:
 
     async def create_arpa_dns(self, fqdn, ip_address):
         self.log.info(
-            f"{self.name}:foreman: creating DNS PTR Record for {fqdn} with ip {ip_address}"
+            "%s:foreman: creating DNS PTR Record for %s with ip %s",
+            self.name,
+            fqdn,
+            ip_address,
         )
         if not self.dns_arpa_enable:
-            self.log.info(f"{self.name}:foreman: reverse DNS is disabled")
+            self.log.debug("%s:foreman: reverse DNS is disabled", self.name)
             return
         ip_addr = ipaddress.IPv4Address(ip_address)
         if self.arpa_responsible(ip_address=ip_addr):
@@ -141,17 +182,23 @@ class CrudForeman:
                 "value": ip_addr.reverse_pointer,
                 "type": "PTR",
             }
-            await self.request_post("/dns/", body_ptr)
+            await self.request_post("/dns/", body_ptr, record_type="PTR")
         self.log.info(
-            f"{self.name}:foreman: creating DNS PTR Record for {fqdn} with ip {ip_address}, done"
+            "%s:foreman: creating DNS PTR Record for %s with ip %s, done",
+            self.name,
+            fqdn,
+            ip_address,
         )
 
     async def create_forward_dns(self, fqdn, ip_address):
         self.log.info(
-            f"{self.name}:foreman: creating DNS A Record for {fqdn} with ip {ip_address}"
+            "%s:foreman: creating DNS A Record for %s with ip %s",
+            self.name,
+            fqdn,
+            ip_address,
         )
         if not self.dns_forward_enable:
-            self.log.info(f"{self.name}:foreman: forward DNS is disabled")
+            self.log.debug("%s:foreman: forward DNS is disabled", self.name)
             return
         body_a = {
             "fqdn": fqdn,
@@ -159,10 +206,13 @@ class CrudForeman:
             "type": "A",
         }
         self.log.info(
-            f"{self.name}:foreman: creating DNS A Record for {fqdn} with ip {ip_address}, done"
+            "%s:foreman: creating DNS A Record for %s with ip %s, done",
+            self.name,
+            fqdn,
+            ip_address,
         )
 
-        await self.request_post("/dns/", body_a)
+        await self.request_post("/dns/", body_a, record_type="A")
 
     async def delete_dns(self, fqdn, ip_address):
         await self.delete_arpa_dns(fqdn=fqdn, ip_address=ip_address)
@@ -170,46 +220,74 @@ class CrudForeman:
 
     async def delete_arpa_dns(self, ip_address, fqdn):
         self.log.info(
-            f"{self.name}:foreman: deleting DNS PTR Record for {fqdn} with ip {ip_address}"
+            "%s:foreman: deleting DNS PTR Record for %s with ip %s",
+            self.name,
+            fqdn,
+            ip_address,
         )
         if not self.dns_arpa_enable:
-            self.log.info(f"{self.name}:foreman: reverse DNS is disabled")
+            self.log.debug("%s:foreman: reverse DNS is disabled", self.name)
             return
         ip_addr = ipaddress.IPv4Address(ip_address)
         if self.arpa_responsible(ip_address=ip_addr):
-            await self.request_delete(f"/dns/{ip_addr.reverse_pointer}/PTR")
+            await self.request_delete(
+                f"/dns/{ip_addr.reverse_pointer}/PTR", record_type="PTR"
+            )
         self.log.info(
-            f"{self.name}:foreman: deleting DNS PTR Record for {fqdn} with ip {ip_address}, done"
+            "%s:foreman: deleting DNS PTR Record for %s with ip %s, done",
+            self.name,
+            fqdn,
+            ip_address,
         )
 
     async def delete_forward_dns(self, ip_address, fqdn):
         self.log.info(
-            f"{self.name}:foreman: deleting DNS A Record for {fqdn} with ip {ip_address}"
+            "%s:foreman: deleting DNS A Record for %s with ip %s",
+            self.name,
+            fqdn,
+            ip_address,
         )
         if not self.dns_forward_enable:
-            self.log.info(f"{self.name}:foreman: forward DNS is disabled")
+            self.log.debug("%s:foreman: forward DNS is disabled", self.name)
             return
-        await self.request_delete(f"/dns/{fqdn}/A")
+        await self.request_delete(f"/dns/{fqdn}/A", record_type="A")
         self.log.info(
-            f"{self.name}:foreman: deleting DNS A Record for {fqdn} with ip {ip_address}, done"
+            "%s:foreman: deleting DNS A Record for %s with ip %s, done",
+            self.name,
+            fqdn,
+            ip_address,
         )
 
     async def create_realm(self, fqdn):
         if not self.realm_enable:
-            self.log.info(f"{self.name}:foreman: realm is disabled")
+            self.log.debug("%s:foreman: realm is disabled", self.name)
             return None
-        self.log.info(f"{self.name}:foreman: creating realm entry for {fqdn}")
+        self.log.info("%s:foreman: creating realm entry for %s", self.name, fqdn)
         body_a = {
             "hostname": fqdn,
         }
-        data = await self.request_post(f"/realm/{self.realm_name}", body_a)
-        self.log.info(f"{self.name}:foreman: creating realm entry for {fqdn}, done")
+        data = await self.request_post(
+            f"/realm/{self.realm_name}", body_a, record_type="realm"
+        )
+        self.log.info("%s:foreman: creating realm entry for %s, done", self.name, fqdn)
         return data["randompassword"]
 
+    async def delete_instance(self, fqdn, ip_address):
+        try:
+            await self.delete_dns(fqdn=fqdn, ip_address=ip_address)
+        except BackendError:
+            pass
+        try:
+            await self.delete_realm(fqdn=fqdn)
+        except BackendError:
+            pass
+
     async def delete_realm(self, fqdn):
         if not self.realm_enable:
-            self.log.info(f"{self.name}:foreman: realm is disabled")
+            self.log.debug("%s:foreman: realm is disabled", self.name)
             return
-        self.log.info(f"{self.name}:foreman: deleting realm entry for {fqdn}")
-        self.log.info(f"{self.name}:foreman: deleting realm entry for {fqdn}, done")
-        await self.request_delete(f"/realm/{self.realm_name}/{fqdn}")
+        self.log.info("%s:foreman: deleting realm entry for %s", self.name, fqdn)
+        self.log.info("%s:foreman: deleting realm entry for %s, done", self.name, fqdn)
+        await self.request_delete(
+            f"/realm/{self.realm_name}/{fqdn}", record_type="realm"
+        )
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+import typing
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from catweazle.crud.common import Crud
+from catweazle.crud.common import CrudMongo
+from catweazle.crud.foreman import CrudForeman
+
+from catweazle.model.health import ModelHealthCheck
+from catweazle.model.health import ModelHealthLiveGet
+from catweazle.model.health import ModelHealthReadyGet
+
+if typing.TYPE_CHECKING:
+    from catweazle.crud.ldap_pool import LdapPool
+
+
+class CrudHealth(Crud):
+    def __init__(
+        self,
+        log: logging.Logger,
+        mongo_db: AsyncIOMotorDatabase,
+        ldap_pool: typing.Optional["LdapPool"],
+        crud_foreman_backends: typing.List[CrudForeman],
+        crud_mongo: typing.List[CrudMongo],
+        interval: float,
+        timeout: float,
+        max_age: float,
+    ):
+        super().__init__(log)
+        self._mongo_db = mongo_db
+        self._ldap_pool = ldap_pool
+        self._crud_foreman_backends = crud_foreman_backends
+        self._crud_mongo = crud_mongo
+        self._interval = interval
+        self._timeout = timeout
+        self._max_age = max_age
+        self._checks: typing.Dict[str, ModelHealthCheck] = {}
+        self._checked: typing.Optional[float] = None
+        self._task = None
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def max_age(self):
+        return self._max_age
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    async def _check(self, name: str, coro: typing.Awaitable) -> None:
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(coro, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._checks[name] = ModelHealthCheck(
+                ok=False, error=f"timeout after {self.timeout} seconds"
+            )
+        except Exception as err:
+            self._checks[name] = ModelHealthCheck(
+                ok=False, error=f"{type(err).__name__}: {err}"
+            )
+        else:
+            self._checks[name] = ModelHealthCheck(
+                ok=True, latency=time.monotonic() - start
+            )
+        if not self._checks[name].ok:
+            self.log.warning(
+                "health check %s failed: %s", name, self._checks[name].error
+            )
+
+    async def run(self) -> None:
+        jobs = [self._check("mongodb", self._mongo_db.command("ping"))]
+        if self._ldap_pool:
+            jobs.append(self._check("ldap", self._ldap_pool.ping()))
+        for foreman in self._crud_foreman_backends:
+            jobs.append(self._check(f"foreman:{foreman.name}", foreman.ping()))
+        await asyncio.gather(*jobs)
+        self._checked = time.time()
+
+    async def _loop(self) -> None:
+        while True:
+            await self.run()
+            await asyncio.sleep(self.interval)
+
+    def run_background(self) -> asyncio.Task:
+        self._task = asyncio.create_task(self._loop())
+        return self._task
+
+    def live(self) -> ModelHealthLiveGet:
+        live = self._task is None or not self._task.done()
+        if self._checked is not None:
+            live = live and time.time() - self._checked <= self.max_age
+        return ModelHealthLiveGet(live=live, last_check=self._checked)
+
+    def ready(self) -> ModelHealthReadyGet:
+        index_builds = [
+            crud.resource_type for crud in self._crud_mongo if crud.index_build_running
+        ]
+        ready = (
+            self._checked is not None
+            and time.time() - self._checked <= self.max_age
+            and all(check.ok for check in self._checks.values())
+            and not index_builds
+        )
+        return ModelHealthReadyGet(
+            ready=ready,
+            checked=self._checked,
+            checks=dict(self._checks),
+            index_builds=index_builds,
+        )
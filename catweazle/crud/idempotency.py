@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+from datetime import UTC
+import hashlib
+import json
+import logging
+import typing
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+import pymongo
+import pymongo.errors
+
+from catweazle.crud.common import CrudMongo
+
+from catweazle.errors import BackendError
+from catweazle.errors import IdempotencyInProgress
+from catweazle.errors import IdempotencyKeyMismatch
+
+
+class CrudIdempotency(CrudMongo):
+    indexes_required = (
+        pymongo.IndexModel([("expires", pymongo.ASCENDING)], expireAfterSeconds=0),
+    )
+    indexes_recommended = (pymongo.IndexModel([("resource_id", pymongo.ASCENDING)]),)
+    unique_fields = ()
+
+    def __init__(
+        self,
+        log: logging.Logger,
+        coll: AsyncIOMotorCollection,
+        ttl: int,
+        pending_timeout: int,
+    ):
+        super(CrudIdempotency, self).__init__(log=log, coll=coll)
+        self._ttl = ttl
+        self._pending_timeout = pending_timeout
+        self._inflight: typing.Dict[str, typing.Tuple[str, asyncio.Task]] = {}
+
+    @property
+    def pending_timeout(self):
+        return self._pending_timeout
+
+    @property
+    def ttl(self):
+        return self._ttl
+
+    @staticmethod
+    def request_hash(request: dict) -> str:
+        return hashlib.sha256(
+            json.dumps(request, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    async def _acquire(self, key: str, request_hash: str, resource_id: str):
+        now = datetime.now(UTC)
+        with self._operation("get"):
+            record = await self.coll.find_one({"_id": key})
+        if record is not None:
+            if record["request_hash"] != request_hash:
+                raise IdempotencyKeyMismatch
+            if record["state"] == "done":
+                return record["response"]
+            if record["expires"].replace(tzinfo=UTC) > now:
+                raise IdempotencyInProgress
+            with self._operation("delete"):
+                await self.coll.delete_one(
+                    {"_id": key, "state": "pending", "expires": record["expires"]}
+                )
+        try:
+            with self._operation("create"):
+                await self.coll.insert_one(
+                    {
+                        "_id": key,
+                        "state": "pending",
+                        "request_hash": request_hash,
+                        "resource_id": resource_id,
+                        "expires": now + timedelta(seconds=self.pending_timeout),
+                    }
+                )
+        except pymongo.errors.DuplicateKeyError:
+            raise IdempotencyInProgress
+        return None
+
+    async def _execute(
+        self,
+        key: str,
+        request_hash: str,
+        resource_id: str,
+        func: typing.Callable[[], typing.Awaitable[dict]],
+    ) -> typing.Tuple[dict, bool]:
+        try:
+            response = await self._acquire(
+                key=key, request_hash=request_hash, resource_id=resource_id
+            )
+        except pymongo.errors.ConnectionFailure as err:
+            self.log.error(f"backend error: {err}")
+            raise BackendError
+        if response is not None:
+            return response, True
+        try:
+            response = await func()
+        except BaseException:
+            try:
+                with self._operation("delete"):
+                    await self.coll.delete_one({"_id": key, "state": "pending"})
+            except pymongo.errors.PyMongoError as err:
+                self.log.error(f"releasing idempotency key {key} failed: {err}")
+            raise
+        try:
+            with self._operation("update"):
+                await self.coll.update_one(
+                    {"_id": key},
+                    {
+                        "$set": {
+                            "state": "done",
+                            "response": response,
+                            "expires": datetime.now(UTC) + timedelta(seconds=self.ttl),
+                        }
+                    },
+                )
+        except pymongo.errors.PyMongoError as err:
+            self.log.error(f"storing idempotency key {key} failed: {err}")
+        return response, False
+
+    async def purge(self, resource_id: str) -> None:
+        try:
+            with self._operation("purge"):
+                await self.coll.delete_many({"resource_id": resource_id})
+        except pymongo.errors.ConnectionFailure as err:
+            self.log.error(f"backend error: {err}")
+            raise BackendError
+
+    async def run(
+        self,
+        key: str,
+        request_hash: str,
+        resource_id: str,
+        func: typing.Callable[[], typing.Awaitable[dict]],
+    ) -> typing.Tuple[dict, bool]:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            inflight_hash, task = inflight
+            if inflight_hash != request_hash:
+                raise IdempotencyKeyMismatch
+            response, _ = await asyncio.shield(task)
+            return response, True
+        task = asyncio.create_task(
+            self._execute(
+                key=key, request_hash=request_hash, resource_id=resource_id, func=func
+            )
+        )
+        self._inflight[key] = (request_hash, task)
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
@@ -1,3 +1,8 @@
+import asyncio
+from datetime import datetime
+from datetime import UTC
+import ipaddress
+import json
 import logging
 import typing
 
@@ -6,48 +11,339 @@ from motor.motor_asyncio import AsyncIOMotorCollection
 import pymongo
 import pymongo.errors
 
+import catweazle.tracing
+
 from catweazle.crud.common import CrudMongo
+from catweazle.crud.instances_replica import CrudInstancesReplica
 
+from catweazle.errors import BackendError
+from catweazle.errors import DuplicateResource
 from catweazle.errors import HostNumRangeExceeded
+from catweazle.errors import ResourceNotFound
+from catweazle.errors import SessionCredentialError
 
-from catweazle.model.v2.common import ModelV2DataDelete
+from catweazle.model.v2.common import count_literal
 from catweazle.model.v2.common import sort_order_literal
 from catweazle.model.v2.instances import ModelV2InstanceGet
 from catweazle.model.v2.instances import ModelV2InstanceGetMulti
+from catweazle.model.v2.instances import ModelV2InstanceMget
 from catweazle.model.v2.instances import ModelV2instancePost
 from catweazle.model.v2.instances import ModelV2instancePut
 
 
 class CrudInstances(CrudMongo):
+    indexes_required = (
+        pymongo.IndexModel([("id", pymongo.ASCENDING)], unique=True),
+        pymongo.IndexModel([("fqdn", pymongo.ASCENDING)], unique=True),
+    )
+    indexes_recommended = (
+        pymongo.IndexModel(
+            [("dns_indicator", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]
+        ),
+        pymongo.IndexModel(
+            [("dns_indicator", pymongo.ASCENDING), ("fqdn", pymongo.ASCENDING)]
+        ),
+        pymongo.IndexModel(
+            [("ip_address", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]
+        ),
+        pymongo.IndexModel(
+            [("id", pymongo.ASCENDING), ("ip_address", pymongo.ASCENDING)]
+        ),
+        pymongo.IndexModel([("meta.$**", pymongo.ASCENDING)]),
+        pymongo.IndexModel([("updated", pymongo.ASCENDING)]),
+        pymongo.IndexModel(
+            [("ip_address_int", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]
+        ),
+    )
+    backfill_batch_size = 1000
+    backfill_pause = 0.1
+    events_buffer = 1000
+    events_heartbeat = 15
+    host_max_range = 1000
+    unique_fields = ("id", "fqdn")
+    versioned = True
+
     def __init__(
-        self, log: logging.Logger, coll: AsyncIOMotorCollection, domain_suffix: str
+        self,
+        log: logging.Logger,
+        coll: AsyncIOMotorCollection,
+        domain_suffix: str,
+        search_read_preference: typing.Optional[str] = None,
+        replica: typing.Optional[CrudInstancesReplica] = None,
     ):
-        super(CrudInstances, self).__init__(log=log, coll=coll)
+        super(CrudInstances, self).__init__(
+            log=log, coll=coll, search_read_preference=search_read_preference
+        )
         self._domain_suffix = domain_suffix
+        self._replica = replica
+        self._waiters: typing.Dict[str, typing.Set[asyncio.Event]] = {}
+        self._watch_task = None
+        self._backfill_task = None
 
     @property
     def domain_suffix(self):
         return self._domain_suffix
 
-    async def _next_num(self, indicator):
-        instances = await self.search(dns_indicator=indicator)
-        taken = list()
-        for instance in instances.result:
-            taken.append(instance.fqdn)
-
-        fqdn = "{0}{1}".format(indicator, self.domain_suffix)
-        host_max_range = 1000
-        for number in range(1, host_max_range):
-            number = str(number)
-            if fqdn.replace("NUM", number) not in taken:
+    @property
+    def replica(self):
+        return self._replica
+
+    @property
+    def replica_fresh(self) -> bool:
+        return self.replica is not None and self.replica.fresh
+
+    def _notify(self, _id: str) -> None:
+        for event in self._waiters.get(_id, ()):
+            event.set()
+
+    async def _watch(self) -> None:
+        pipeline = [
+            {"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}},
+            {"$project": {"fullDocument.id": 1}},
+        ]
+        while True:
+            try:
+                self.log.info(f"watching {self.resource_type} change stream")
+                async with self.coll.watch(
+                    pipeline=pipeline, full_document="updateLookup"
+                ) as stream:
+                    async for change in stream:
+                        document = change.get("fullDocument")
+                        if document and "id" in document:
+                            self._notify(document["id"])
+            except pymongo.errors.PyMongoError as err:
+                self.log.error(f"{self.resource_type} change stream failed: {err}")
+                await asyncio.sleep(5)
+
+    async def _events_read(self, stream, queue: asyncio.Queue) -> None:
+        operations = {
+            "insert": "create",
+            "update": "update",
+            "replace": "update",
+            "delete": "delete",
+        }
+        try:
+            async for change in stream:
+                if queue.qsize() >= self.events_buffer:
+                    self.log.warning(
+                        f"{self.resource_type} event subscriber too slow, disconnecting"
+                    )
+                    queue.put_nowait({"event": "overflow", "data": {}})
+                    return
+                document = change.get("fullDocument")
+                if not document:
+                    document = change.get("fullDocumentBeforeChange") or {}
+                document.pop("_id", None)
+                if "id" not in document:
+                    # deletes without a pre-image only carry the ObjectId
+                    oid = change["documentKey"]["_id"]
+                    document["id"] = self.replica.resolve(oid) if self.replica else None
+                queue.put_nowait(
+                    {
+                        "id": change["_id"]["_data"],
+                        "event": operations[change["operationType"]],
+                        "data": document,
+                    }
+                )
+            # the change stream was invalidated or closed
+            queue.put_nowait({"event": "closed", "data": {}})
+        except pymongo.errors.PyMongoError as err:
+            self.log.error(f"{self.resource_type} event stream failed: {err}")
+            queue.put_nowait({"event": "error", "data": {"detail": str(err)}})
+        except Exception as err:
+            self.log.exception(f"{self.resource_type} event stream failed: {err}")
+            queue.put_nowait({"event": "error", "data": {"detail": "internal error"}})
+
+    async def events(
+        self,
+        dns_indicator: typing.Optional[str] = None,
+        meta: typing.Optional[typing.Dict[str, typing.List[str]]] = None,
+        subnet: typing.Optional[ipaddress.IPv4Network] = None,
+        resume_token: typing.Optional[str] = None,
+    ) -> typing.AsyncIterator[typing.Optional[dict]]:
+        filters = [
+            {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}
+        ]
+        selectors = {}
+        if dns_indicator:
+            selectors["dns_indicator"] = {"$regex": dns_indicator}
+        self._filter_dict(selectors, "meta", meta)
+        if subnet:
+            selectors["ip_address_int"] = {
+                "$gte": int(subnet.network_address),
+                "$lte": int(subnet.broadcast_address),
+            }
+        for field, selector in selectors.items():
+            filters.append(
+                {
+                    "$or": [
+                        {f"fullDocument.{field}": selector},
+                        {f"fullDocumentBeforeChange.{field}": selector},
+                    ]
+                }
+            )
+        pipeline = [
+            {"$match": {"$and": filters}},
+            {
+                "$unset": [
+                    "fullDocument.ip_address_int",
+                    "fullDocument.ipa_otp",
+                    "fullDocument.updated",
+                    "fullDocument.version",
+                    "fullDocumentBeforeChange.ip_address_int",
+                    "fullDocumentBeforeChange.ipa_otp",
+                    "fullDocumentBeforeChange.updated",
+                    "fullDocumentBeforeChange.version",
+                ]
+            },
+        ]
+        stream = self.coll.watch(
+            pipeline=pipeline,
+            full_document="updateLookup",
+            full_document_before_change="whenAvailable",
+            resume_after={"_data": resume_token} if resume_token else None,
+        )
+        queue = asyncio.Queue(maxsize=self.events_buffer + 1)
+        reader = asyncio.create_task(self._events_read(stream=stream, queue=queue))
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=self.events_heartbeat
+                    )
+                except asyncio.TimeoutError:
+                    if reader.done():
+                        return
+                    yield None
+                    continue
+                yield event
+                if event["event"] in ("closed", "overflow", "error"):
+                    return
+        finally:
+            reader.cancel()
+            await stream.close()
+
+    async def preimages_enable(self) -> None:
+        try:
+            await self.coll.database.command(
+                "collMod",
+                self.coll.name,
+                changeStreamPreAndPostImages={"enabled": True},
+            )
+        except pymongo.errors.OperationFailure as err:
+            self.log.warning(
+                f"{self.resource_type} change stream pre-images not available: {err}"
+            )
+
+    def watch_background(self) -> asyncio.Task:
+        self._watch_task = asyncio.create_task(self._watch())
+        return self._watch_task
+
+    async def ip_backfill(self) -> None:
+        query = {
+            "ip_address_int": {"$exists": False},
+            "ip_address": {"$type": "string"},
+        }
+        total = 0
+        try:
+            while True:
+                batch = await self.coll.find(
+                    filter=query, projection={"ip_address": 1}
+                ).to_list(self.backfill_batch_size)
+                if not batch:
+                    break
+                requests = []
+                for item in batch:
+                    try:
+                        value = int(ipaddress.IPv4Address(item["ip_address"]))
+                    except ValueError:
+                        value = None
+                    requests.append(
+                        pymongo.UpdateOne(
+                            {"_id": item["_id"], "ip_address_int": {"$exists": False}},
+                            {"$set": {"ip_address_int": value}},
+                        )
+                    )
+                await self.coll.bulk_write(requests, ordered=False)
+                total += len(batch)
+                await asyncio.sleep(self.backfill_pause)
+        except pymongo.errors.PyMongoError as err:
+            self.log.error(
+                f"{self.resource_type} ip_address_int backfill failed: {err}"
+            )
+            return
+        if total:
+            self.log.info(
+                f"{self.resource_type} ip_address_int backfill, done: {total} documents"
+            )
+
+    async def updated_backfill(self) -> None:
+        try:
+            await self.coll.update_many(
+                {"updated": {"$exists": False}},
+                {"$set": {"updated": datetime.now(UTC)}},
+            )
+        except pymongo.errors.ConnectionFailure as err:
+            self.log.error(f"backend error: {err}")
+            raise BackendError
+
+    def ip_backfill_background(self) -> asyncio.Task:
+        self._backfill_task = asyncio.create_task(self.ip_backfill())
+        return self._backfill_task
+
+    def replica_background(self) -> asyncio.Task:
+        return self.replica.sync_background(notify=self._notify)
+
+    async def _next_num(self, indicator, local=False):
+        with catweazle.tracing.span(
+            "instances.next_num",
+            attributes={"catweazle.dns_indicator": indicator, "catweazle.local": local},
+        ):
+            if local:
+                number = self.replica.next_num(indicator, self.host_max_range)
+                if number is None:
+                    raise HostNumRangeExceeded(max_range=self.host_max_range)
                 return number
-        raise HostNumRangeExceeded(max_range=host_max_range)
+            result = await self._search(
+                query=self._search_query(dns_indicator=indicator),
+                fields=["fqdn"],
+                count="none",
+                primary=True,
+            )
+            taken = set()
+            for instance in result["result"]:
+                taken.add(instance["fqdn"])
 
-    async def index_create(self) -> None:
-        self.log.info(f"creating {self.resource_type} indices")
-        await self.coll.create_index([("id", pymongo.ASCENDING)], unique=True)
-        await self.coll.create_index([("fqdn", pymongo.ASCENDING)], unique=True)
-        self.log.info(f"creating {self.resource_type} indices, done")
+            fqdn = "{0}{1}".format(indicator, self.domain_suffix)
+            for number in range(1, self.host_max_range):
+                number = str(number)
+                if fqdn.replace("NUM", number) not in taken:
+                    return number
+            raise HostNumRangeExceeded(max_range=self.host_max_range)
+
+    def _search_query(
+        self,
+        _id: typing.Optional[str] = None,
+        dns_indicator: typing.Optional[str] = None,
+        ip_address: typing.Optional[str] = None,
+        fqdn: typing.Optional[str] = None,
+        meta: typing.Optional[typing.Dict[str, typing.List[str]]] = None,
+        subnet: typing.Optional[ipaddress.IPv4Network] = None,
+        query: typing.Optional[dict] = None,
+    ) -> dict:
+        if not query:
+            query = {}
+        self._filter_re(query, "id", _id)
+        self._filter_re(query, "dns_indicator", dns_indicator)
+        self._filter_re(query, "ip_address", ip_address)
+        self._filter_re(query, "fqdn", fqdn)
+        self._filter_dict(query, "meta", meta)
+        if subnet:
+            query["ip_address_int"] = {
+                "$gte": int(subnet.network_address),
+                "$lte": int(subnet.broadcast_address),
+            }
+        return query
 
     async def create(
         self, _id: str, payload: ModelV2instancePost, fields: list
@@ -55,31 +351,188 @@ class CrudInstances(CrudMongo):
         data = payload.model_dump()
         data["id"] = _id
 
+        local = self.replica_fresh
         fqdn = f"{payload.dns_indicator}{self.domain_suffix}"
         if "NUM" in payload.dns_indicator:
-            number = await self._next_num(payload.dns_indicator)
+            number = await self._next_num(payload.dns_indicator, local=local)
             fqdn = f"{payload.dns_indicator.replace('NUM', number)}{self.domain_suffix}"
         data["fqdn"] = fqdn
         data["ip_address"] = str(payload.ip_address)
-        result = await self._create(fields=fields, payload=data)
-        return ModelV2InstanceGet(**result)
+        data["ip_address_int"] = int(payload.ip_address)
+        data["updated"] = datetime.now(UTC)
+        try:
+            result = await self._create(fields=fields, payload=data)
+        except DuplicateResource:
+            if not local or "NUM" not in payload.dns_indicator:
+                raise
+            data.pop("_id", None)
+            number = await self._next_num(payload.dns_indicator)
+            data["fqdn"] = (
+                f"{payload.dns_indicator.replace('NUM', number)}{self.domain_suffix}"
+            )
+            result = await self._create(fields=fields, payload=data)
+        self._notify(_id)
+        return ModelV2InstanceGet.model_construct(**result)
 
     async def delete(
         self,
         _id: str,
-    ) -> ModelV2DataDelete:
-        query = {"id": _id}
-        await self._delete(query=query)
-        return ModelV2DataDelete()
+        fields: typing.Optional[list] = None,
+        query: typing.Optional[dict] = None,
+    ) -> ModelV2InstanceGet:
+        if query:
+            query = {"$and": [{"id": _id}, query]}
+        else:
+            query = {"id": _id}
+        result = await self._delete(query=query, fields=fields)
+        return ModelV2InstanceGet.model_construct(**result)
+
+    async def export(
+        self,
+        _id: typing.Optional[str] = None,
+        dns_indicator: typing.Optional[str] = None,
+        ip_address: typing.Optional[str] = None,
+        fqdn: typing.Optional[str] = None,
+        meta: typing.Optional[typing.Dict[str, typing.List[str]]] = None,
+        subnet: typing.Optional[ipaddress.IPv4Network] = None,
+        fields: typing.Optional[list] = None,
+        sort: typing.Optional[str] = None,
+        sort_order: typing.Optional[sort_order_literal] = None,
+    ) -> typing.AsyncIterator[str]:
+        query = self._search_query(
+            _id=_id,
+            dns_indicator=dns_indicator,
+            ip_address=ip_address,
+            fqdn=fqdn,
+            meta=meta,
+            subnet=subnet,
+        )
+        async for item in self._export(
+            query=query,
+            fields=fields,
+            sort=sort,
+            sort_order=sort_order,
+        ):
+            yield json.dumps(item, default=str) + "\n"
 
     async def get(
         self,
         _id: str,
         fields: list,
     ) -> ModelV2InstanceGet:
+        result = None
+        if self.replica_fresh:
+            result = self.replica.get(_id=_id, fields=fields)
+        if result is None:
+            result = await self._get(query={"id": _id}, fields=fields)
+        return ModelV2InstanceGet.model_construct(**result)
+
+    async def get_versioned(
+        self,
+        _id: str,
+        fields: list,
+        client_ip: typing.Optional[str] = None,
+    ) -> typing.Tuple[ModelV2InstanceGet, ObjectId, int]:
         query = {"id": _id}
-        result = await self._get(query=query, fields=fields)
-        return ModelV2InstanceGet(**result)
+        if client_ip is not None:
+            query["ip_address"] = client_ip
+        projection = None
+        if fields:
+            projection = list(set(fields) | {"_id", "version"})
+        result = None
+        if self.replica_fresh:
+            result = self.replica.get(_id=_id, fields=projection, ip_address=client_ip)
+        if result is None:
+            try:
+                result = await self._get(query=query, fields=projection, raw=True)
+            except ResourceNotFound:
+                if client_ip is not None:
+                    raise SessionCredentialError
+                raise
+        identity = result.pop("_id", None)
+        version = result.pop("version", 0)
+        return ModelV2InstanceGet.model_construct(**result), identity, version
+
+    async def wait_versioned(
+        self,
+        _id: str,
+        fields: list,
+        until: list,
+        timeout: float,
+        client_ip: typing.Optional[str] = None,
+    ) -> typing.Tuple[ModelV2InstanceGet, ObjectId, int]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        event = asyncio.Event()
+        self._waiters.setdefault(_id, set()).add(event)
+        try:
+            while True:
+                event.clear()
+                try:
+                    instance, identity, version = await self.get_versioned(
+                        _id=_id,
+                        fields=list(set(fields) | set(until)),
+                        client_ip=client_ip,
+                    )
+                except (ResourceNotFound, SessionCredentialError):
+                    instance, identity, version = None, None, 0
+                if instance and all(getattr(instance, f, None) for f in until):
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters[_id].discard(event)
+            if not self._waiters[_id]:
+                del self._waiters[_id]
+        if instance is None:
+            if client_ip is not None:
+                raise SessionCredentialError
+            raise ResourceNotFound(
+                details=f"Resource {self.resource_type} {{'id': '{_id}'}} not found"
+            )
+        result = instance.model_dump(include=set(fields), exclude_unset=True)
+        return ModelV2InstanceGet.model_construct(**result), identity, version
+
+    async def mget(
+        self,
+        ids: typing.List[str],
+        fields: typing.Optional[list] = None,
+    ) -> ModelV2InstanceMget:
+        ids = list(dict.fromkeys(ids))
+        projection = None
+        if fields:
+            projection = list(set(fields) | {"id"})
+        found = {}
+        pending = ids
+        if self.replica_fresh:
+            for _id in ids:
+                item = self.replica.get(_id=_id, fields=projection)
+                if item is not None:
+                    found[_id] = item
+            # the replica may lag behind recent creates, confirm misses in mongodb
+            pending = [_id for _id in ids if _id not in found]
+        if pending:
+            result = await self._search(
+                query={"id": {"$in": pending}}, fields=projection, count="none"
+            )
+            for item in result["result"]:
+                found[item["id"]] = item
+        if fields and "id" not in fields:
+            for item in found.values():
+                item.pop("id", None)
+        return ModelV2InstanceMget.model_construct(
+            result=[
+                ModelV2InstanceGet.model_construct(**found[_id])
+                for _id in ids
+                if _id in found
+            ],
+            missing=[_id for _id in ids if _id not in found],
+        )
 
     async def resource_exists(
         self,
@@ -94,28 +547,60 @@ class CrudInstances(CrudMongo):
         dns_indicator: typing.Optional[str] = None,
         ip_address: typing.Optional[str] = None,
         fqdn: typing.Optional[str] = None,
+        meta: typing.Optional[typing.Dict[str, typing.List[str]]] = None,
+        subnet: typing.Optional[ipaddress.IPv4Network] = None,
         fields: typing.Optional[list] = None,
         sort: typing.Optional[str] = None,
         sort_order: typing.Optional[sort_order_literal] = None,
         page: typing.Optional[int] = None,
         limit: typing.Optional[int] = None,
+        cursor: typing.Optional[str] = None,
+        count: count_literal = "exact",
         query: typing.Optional[dict] = None,
     ) -> ModelV2InstanceGetMulti:
-        if not query:
-            query = {}
-        self._filter_re(query, "id", _id)
-        self._filter_re(query, "dns_indicator", dns_indicator)
-        self._filter_re(query, "ip_address", ip_address)
-        self._filter_re(query, "fqdn", fqdn)
-        result = await self._search(
+        local = self.replica_fresh and not query
+        query = self._search_query(
+            _id=_id,
+            dns_indicator=dns_indicator,
+            ip_address=ip_address,
+            fqdn=fqdn,
+            meta=meta,
+            subnet=subnet,
             query=query,
-            fields=fields,
-            sort=sort,
-            sort_order=sort_order,
-            page=page,
-            limit=limit,
         )
-        return ModelV2InstanceGetMulti(**result)
+        result = None
+        if local:
+            result = self.replica.search(
+                filters={
+                    "id": _id,
+                    "dns_indicator": dns_indicator,
+                    "ip_address": ip_address,
+                    "fqdn": fqdn,
+                },
+                meta=meta,
+                subnet=subnet,
+                fields=fields,
+                sort=sort,
+                sort_order=sort_order,
+                page=page,
+                limit=limit,
+                cursor=cursor,
+                count=count,
+            )
+        if result is None:
+            result = await self._search(
+                query=query,
+                fields=fields,
+                sort=sort,
+                sort_order=sort_order,
+                page=page,
+                limit=limit,
+                cursor=cursor,
+                count=count,
+            )
+        return self._format_model_multi(
+            ModelV2InstanceGetMulti, ModelV2InstanceGet, result
+        )
 
     async def update(
         self,
@@ -125,8 +610,10 @@ class CrudInstances(CrudMongo):
     ) -> ModelV2InstanceGet:
         query = {"id": _id}
         data = payload.model_dump()
+        data["updated"] = datetime.now(UTC)
         result = await self._update(query=query, fields=fields, payload=data)
-        return ModelV2InstanceGet(**result)
+        self._notify(_id)
+        return ModelV2InstanceGet.model_construct(**result)
 
     async def update_ipa_otp(
         self,
@@ -135,7 +622,8 @@ class CrudInstances(CrudMongo):
         fields: list,
     ) -> ModelV2InstanceGet:
         query = {"id": _id}
-        data = {"ipa_otp": ipa_otp}
+        data = {"ipa_otp": ipa_otp, "updated": datetime.now(UTC)}
 
         result = await self._update(query=query, fields=fields, payload=data)
-        return ModelV2InstanceGet(**result)
+        self._notify(_id)
+        return ModelV2InstanceGet.model_construct(**result)
@@ -0,0 +1,187 @@
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+from datetime import UTC
+import logging
+import os
+import socket
+import typing
+import uuid
+
+import pymongo.errors
+
+from catweazle.crud.audit import CrudAudit
+from catweazle.crud.common import Crud
+from catweazle.crud.foreman import CrudForeman
+from catweazle.crud.idempotency import CrudIdempotency
+from catweazle.crud.instances import CrudInstances
+from catweazle.crud.locks import CrudLocks
+
+from catweazle.errors import BackendError
+from catweazle.errors import ResourceNotFound
+
+from catweazle.model.v2.instances import ModelV2InstanceGetMulti
+
+
+class CrudInstancesGc(Crud):
+    lock_name = "instances_gc"
+
+    def __init__(
+        self,
+        log: logging.Logger,
+        crud_audit: CrudAudit,
+        crud_idempotency: CrudIdempotency,
+        crud_instances: CrudInstances,
+        crud_foreman_backends: typing.List[CrudForeman],
+        crud_locks: CrudLocks,
+        interval: float,
+        states: typing.List[str],
+        state_age: float,
+        max_age: typing.Optional[float],
+        batch_size: int,
+        rate: float,
+    ):
+        super().__init__(log)
+        self._crud_audit = crud_audit
+        self._crud_idempotency = crud_idempotency
+        self._crud_instances = crud_instances
+        self._crud_foreman_backends = crud_foreman_backends
+        self._crud_locks = crud_locks
+        self._interval = interval
+        self._states = states
+        self._state_age = state_age
+        self._max_age = max_age
+        self._batch_size = batch_size
+        self._rate = rate
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task = None
+
+    @property
+    def crud_audit(self):
+        return self._crud_audit
+
+    @property
+    def crud_idempotency(self):
+        return self._crud_idempotency
+
+    @property
+    def crud_instances(self):
+        return self._crud_instances
+
+    @property
+    def crud_foreman_backends(self):
+        return self._crud_foreman_backends
+
+    @property
+    def crud_locks(self):
+        return self._crud_locks
+
+    @property
+    def interval(self):
+        return self._interval
+
+    def query(self) -> typing.Optional[dict]:
+        now = datetime.now(UTC)
+        conditions = []
+        if self._states:
+            conditions.append(
+                {
+                    "meta.instance_state": {"$in": self._states},
+                    "updated": {"$lt": now - timedelta(seconds=self._state_age)},
+                }
+            )
+        if self._max_age:
+            conditions.append(
+                {"updated": {"$lt": now - timedelta(seconds=self._max_age)}}
+            )
+        if not conditions:
+            return None
+        return {"$or": conditions}
+
+    async def candidates(self, limit: int) -> ModelV2InstanceGetMulti:
+        query = self.query()
+        if not query:
+            return ModelV2InstanceGetMulti.model_construct(result=[], meta={})
+        return await self.crud_instances.search(
+            query=query,
+            fields=["id", "dns_indicator", "fqdn", "ip_address", "meta"],
+            sort="id",
+            sort_order="ascending",
+            page=0,
+            limit=limit,
+        )
+
+    async def run(self) -> int:
+        if not self.query():
+            return 0
+        if not await self.crud_locks.acquire(
+            name=self.lock_name, owner=self._owner, ttl=self.interval
+        ):
+            self.log.info("instances gc is running on another replica, skipping")
+            return 0
+        self.log.info("instances gc")
+        deleted = 0
+        processed = set()
+        try:
+            await self.crud_instances.updated_backfill()
+            while True:
+                batch = await self.crud_instances.search(
+                    query=self.query(),
+                    fields=["id"],
+                    sort="id",
+                    sort_order="ascending",
+                    page=0,
+                    limit=self._batch_size,
+                    count="none",
+                )
+                pending = [i.id for i in batch.result if i.id not in processed]
+                if not pending:
+                    break
+                for _id in pending:
+                    processed.add(_id)
+                    try:
+                        instance = await self.crud_instances.delete(
+                            _id=_id, fields=["fqdn", "ip_address"], query=self.query()
+                        )
+                    except ResourceNotFound:
+                        continue
+                    self.log.info(f"instances gc: deleted stale instance {_id}")
+                    await self.crud_idempotency.purge(resource_id=_id)
+                    await self.crud_audit.record(
+                        actor="system:gc",
+                        action="delete",
+                        resource_type="instance",
+                        resource_id=_id,
+                        details={
+                            "fqdn": instance.fqdn,
+                            "ip_address": instance.ip_address,
+                        },
+                    )
+                    for foreman in self.crud_foreman_backends:
+                        await foreman.delete_instance(
+                            fqdn=instance.fqdn, ip_address=instance.ip_address
+                        )
+                    deleted += 1
+                    if self._rate:
+                        await asyncio.sleep(1 / self._rate)
+                if not await self.crud_locks.acquire(
+                    name=self.lock_name, owner=self._owner, ttl=self.interval
+                ):
+                    self.log.warning("instances gc: lost lock, stopping")
+                    break
+        finally:
+            await self.crud_locks.release(name=self.lock_name, owner=self._owner)
+        self.log.info(f"instances gc, done: deleted {deleted} instances")
+        return deleted
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run()
+            except (BackendError, pymongo.errors.PyMongoError) as err:
+                self.log.error(f"instances gc failed: {err}")
+            await asyncio.sleep(self.interval)
+
+    def run_background(self) -> asyncio.Task:
+        self._task = asyncio.create_task(self._loop())
+        return self._task
@@ -0,0 +1,359 @@
+import asyncio
+import ipaddress
+import logging
+import re
+import sys
+import time
+import typing
+
+from bson.objectid import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+import pymongo.errors
+
+from catweazle.crud.common import Crud
+from catweazle.crud.mixins import Format
+from catweazle.crud.mixins import PaginationCursorMixIn
+from catweazle.crud.mixins import PaginationSkipMixIn
+
+
+class InstanceRecord:
+    __slots__ = (
+        "_id",
+        "id",
+        "dns_indicator",
+        "fqdn",
+        "ip_address",
+        "ip_address_int",
+        "ipa_otp",
+        "meta",
+        "version",
+    )
+
+    def __init__(self, document: dict):
+        for field in self.__slots__:
+            if field in document:
+                setattr(self, field, document[field])
+
+    def get(self, field: str, default=None):
+        return getattr(self, field, default)
+
+    def project(self, fields: typing.Optional[list] = None) -> dict:
+        result = {}
+        for field in fields or self.__slots__[1:]:
+            if hasattr(self, field):
+                result[field] = getattr(self, field)
+        return result
+
+    def size(self) -> int:
+        size = sys.getsizeof(self)
+        for field in self.__slots__:
+            value = getattr(self, field, None)
+            size += sys.getsizeof(value)
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    size += sys.getsizeof(k) + sys.getsizeof(v)
+        return size
+
+
+class CrudInstancesReplica(Crud, Format, PaginationCursorMixIn, PaginationSkipMixIn):
+    max_await_time_ms = 1000
+    removed_max = 10000
+    unique_fields = ("id", "fqdn")
+
+    def __init__(
+        self,
+        log: logging.Logger,
+        coll: AsyncIOMotorCollection,
+        domain_suffix: str,
+        max_lag: float,
+    ):
+        super().__init__(log)
+        self._coll = coll
+        self._domain_suffix = domain_suffix
+        self._max_lag = max_lag
+        self._records: typing.Dict[str, InstanceRecord] = {}
+        self._by_oid: typing.Dict[ObjectId, str] = {}
+        self._removed: typing.Dict[ObjectId, str] = {}
+        self._by_fqdn: typing.Dict[str, str] = {}
+        self._by_ip: typing.Dict[str, typing.Set[str]] = {}
+        self._numbers: typing.Dict[str, int] = {}
+        self._number_patterns: typing.Dict[str, re.Pattern] = {}
+        self._notify = None
+        self._ready = False
+        self._synced = 0.0
+        self._sync_task = None
+
+    @property
+    def coll(self):
+        return self._coll
+
+    @property
+    def domain_suffix(self):
+        return self._domain_suffix
+
+    @property
+    def fresh(self) -> bool:
+        return self._ready and self.lag <= self.max_lag
+
+    @property
+    def lag(self) -> float:
+        return time.monotonic() - self._synced
+
+    @property
+    def max_lag(self):
+        return self._max_lag
+
+    def _number(self, record: InstanceRecord) -> typing.Optional[int]:
+        indicator = record.get("dns_indicator")
+        fqdn = record.get("fqdn")
+        if not indicator or not fqdn or "NUM" not in indicator:
+            return None
+        pattern = self._number_patterns.get(indicator)
+        if pattern is None:
+            pattern = re.compile(
+                re.escape(indicator)
+                .replace("NUM", r"(?P<num>[0-9]+)", 1)
+                .replace("NUM", r"(?P=num)")
+                + re.escape(self.domain_suffix)
+                + "$"
+            )
+            self._number_patterns[indicator] = pattern
+        match = pattern.match(fqdn)
+        if not match:
+            return None
+        return int(match.group("num"))
+
+    def _add(self, record: InstanceRecord) -> None:
+        self._remove(record.get("id"))
+        self._records[record.id] = record
+        self._by_oid[record._id] = record.id
+        if record.get("fqdn"):
+            self._by_fqdn[record.fqdn] = record.id
+        if record.get("ip_address"):
+            self._by_ip.setdefault(record.ip_address, set()).add(record.id)
+        number = self._number(record)
+        if number is not None:
+            self._numbers[record.dns_indicator] = self._numbers.get(
+                record.dns_indicator, 0
+            ) | (1 << number)
+
+    def _remove(self, _id: typing.Optional[str]) -> None:
+        record = self._records.pop(_id, None)
+        if record is None:
+            return
+        self._by_oid.pop(record._id, None)
+        if self._by_fqdn.get(record.get("fqdn")) == _id:
+            del self._by_fqdn[record.fqdn]
+        ids = self._by_ip.get(record.get("ip_address"))
+        if ids is not None:
+            ids.discard(_id)
+            if not ids:
+                del self._by_ip[record.ip_address]
+        number = self._number(record)
+        if number is not None:
+            bitmap = self._numbers[record.dns_indicator] & ~(1 << number)
+            if bitmap:
+                self._numbers[record.dns_indicator] = bitmap
+            else:
+                del self._numbers[record.dns_indicator]
+
+    def _apply(self, change: dict) -> None:
+        operation = change["operationType"]
+        _id = None
+        if operation == "delete":
+            oid = change["documentKey"]["_id"]
+            _id = self._by_oid.get(oid)
+            self._remove(_id)
+            if _id:
+                # keep recent deletes resolvable for event stream readers
+                self._removed[oid] = _id
+                if len(self._removed) > self.removed_max:
+                    del self._removed[next(iter(self._removed))]
+        elif operation in ("insert", "update", "replace"):
+            document = change.get("fullDocument")
+            if document and "id" in document:
+                _id = document["id"]
+                self._add(InstanceRecord(document))
+        if _id and self._notify:
+            self._notify(_id)
+
+    async def _load(self) -> None:
+        self.log.info("loading instances replica")
+        reply = await self.coll.database.command("ping")
+        self._records.clear()
+        self._by_oid.clear()
+        self._removed.clear()
+        self._by_fqdn.clear()
+        self._by_ip.clear()
+        self._numbers.clear()
+        async for document in self.coll.find({}):
+            if "id" in document:
+                self._add(InstanceRecord(document))
+        self.log.info(f"loading instances replica, done: {len(self._records)} records")
+        async with self.coll.watch(
+            full_document="updateLookup",
+            start_at_operation_time=reply.get("operationTime"),
+            max_await_time_ms=self.max_await_time_ms,
+        ) as stream:
+            while stream.alive:
+                change = await stream.try_next()
+                now = time.monotonic()
+                if change is None:
+                    self._synced = now
+                else:
+                    self._apply(change)
+                    self._synced = now - max(
+                        0.0, time.time() - change["clusterTime"].time
+                    )
+                self._ready = True
+        self._ready = False
+
+    async def _sync(self) -> None:
+        while True:
+            try:
+                await self._load()
+            except pymongo.errors.PyMongoError as err:
+                self._ready = False
+                self.log.error(f"instances replica sync failed: {err}")
+                await asyncio.sleep(5)
+
+    def sync_background(
+        self, notify: typing.Optional[typing.Callable[[str], None]] = None
+    ) -> asyncio.Task:
+        self._notify = notify
+        self._sync_task = asyncio.create_task(self._sync())
+        return self._sync_task
+
+    def get(
+        self,
+        _id: str,
+        fields: typing.Optional[list],
+        ip_address: typing.Optional[str] = None,
+    ) -> typing.Optional[dict]:
+        record = self._records.get(_id)
+        if record is None:
+            return None
+        if ip_address is not None and record.get("ip_address") != ip_address:
+            return None
+        return record.project(fields)
+
+    def resolve(self, oid: ObjectId) -> typing.Optional[str]:
+        return self._by_oid.get(oid) or self._removed.get(oid)
+
+    def next_num(self, indicator: str, host_max_range: int) -> typing.Optional[str]:
+        taken = self._numbers.get(indicator, 0) | 1
+        while True:
+            number = (~taken & (taken + 1)).bit_length() - 1
+            if number >= host_max_range:
+                return None
+            fqdn = f"{indicator.replace('NUM', str(number))}{self.domain_suffix}"
+            if fqdn not in self._by_fqdn:
+                return str(number)
+            taken |= 1 << number
+
+    def search(
+        self,
+        filters: typing.Dict[str, typing.Optional[str]],
+        meta: typing.Optional[typing.Dict[str, typing.List[str]]] = None,
+        subnet: typing.Optional[ipaddress.IPv4Network] = None,
+        fields: typing.Optional[list] = None,
+        sort: typing.Optional[str] = None,
+        sort_order: typing.Optional[str] = None,
+        page: typing.Optional[int] = None,
+        limit: typing.Optional[int] = None,
+        cursor: typing.Optional[str] = None,
+        count: str = "exact",
+    ) -> typing.Optional[dict]:
+        try:
+            patterns = [
+                (field, re.compile(selector))
+                for field, selector in filters.items()
+                if selector
+            ]
+        except re.error:
+            return None
+        result = [
+            record
+            for record in self._records.values()
+            if all(
+                isinstance(record.get(field), str) and pattern.search(record.get(field))
+                for field, pattern in patterns
+            )
+            and all(
+                (record.get("meta") or {}).get(key) in values
+                for key, values in (meta or {}).items()
+            )
+            and (
+                not subnet
+                or record.get("ip_address_int") is not None
+                and int(subnet.network_address)
+                <= record.get("ip_address_int")
+                <= int(subnet.broadcast_address)
+            )
+        ]
+        if count == "estimated" and not patterns and not meta and not subnet:
+            count = len(self._records)
+        elif count in ("exact", "estimated"):
+            count = len(result)
+        else:
+            count = None
+
+        def key(record):
+            value = record.get(sort)
+            return (value is not None, value or ""), record._id
+
+        if sort and sort_order:
+            descending = sort_order != "ascending"
+            result.sort(key=key, reverse=descending)
+            if cursor:
+                value, _id = self._pagination_cursor_decode(
+                    cursor=cursor, sort=sort, sort_order=sort_order
+                )
+                size = 1 if sort in self.unique_fields and value is not None else 2
+                after = ((value is not None, value or ""), _id)[:size]
+                if descending:
+                    result = [r for r in result if key(r)[:size] < after]
+                else:
+                    result = [r for r in result if key(r)[:size] > after]
+        if limit:
+            if page and not cursor:
+                skip = self._pagination_skip(page, limit)
+                result = result[skip:]
+            result = result[:limit]
+        next_cursor = None
+        if limit and sort and sort_order and len(result) == limit:
+            last = result[-1]
+            next_cursor = self._pagination_cursor_encode(
+                item={sort: last.get(sort), "_id": last._id},
+                sort=sort,
+                sort_order=sort_order,
+            )
+        return self._format_multi(
+            [record.project(fields) for record in result],
+            count=count,
+            next_cursor=next_cursor,
+        )
+
+    def stats(self) -> dict:
+        size = sum(
+            sys.getsizeof(index)
+            for index in (
+                self._records,
+                self._by_oid,
+                self._by_fqdn,
+                self._by_ip,
+                self._numbers,
+            )
+        )
+        size += sum(record.size() for record in self._records.values())
+        size += sum(sys.getsizeof(ids) for ids in self._by_ip.values())
+        size += sum(sys.getsizeof(bitmap) for bitmap in self._numbers.values())
+        return {
+            "enabled": True,
+            "ready": self._ready,
+            "fresh": self.fresh,
+            "records": len(self._records),
+            "memory_bytes": size,
+            "lag": self.lag if self._ready else None,
+            "max_lag": self.max_lag,
+        }
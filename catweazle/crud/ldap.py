@@ -1,15 +1,22 @@
 import asyncio
 import logging
+import typing
 
-import bonsai.asyncio
-import bonsai.errors
-import bonsai.pool
+import catweazle.metrics
+import catweazle.tracing
 
 from catweazle.errors import AuthenticationError
+from catweazle.errors import BackendError
 from catweazle.errors import LdapInvalidDN
+from catweazle.errors import LdapPoolTimeout
 from catweazle.errors import LdapResourceNotFound
 from catweazle.errors import LdapNoBackend
 
+if typing.TYPE_CHECKING:
+    import bonsai
+
+    from catweazle.crud.ldap_pool import LdapPool
+
 
 class CrudLdap:
     def __init__(
@@ -17,14 +24,18 @@ class CrudLdap:
         log: logging.Logger,
         ldap_base_dn: str,
         ldap_bind_dn: str,
-        ldap_pool: bonsai.asyncio.AIOConnectionPool,
+        ldap_pool: typing.Optional["LdapPool"],
         ldap_url: str,
         ldap_user_pattern: str,
+        ldap_retries: int = 3,
+        ldap_retry_backoff: float = 0.1,
     ):
         self._log = log
         self._ldap_base_dn = ldap_base_dn
         self._ldap_bind_dn = ldap_bind_dn
         self._ldap_pool = ldap_pool
+        self._ldap_retries = ldap_retries
+        self._ldap_retry_backoff = ldap_retry_backoff
         self._ldap_url = ldap_url
         self._ldap_user_pattern = ldap_user_pattern
 
@@ -41,11 +52,19 @@ class CrudLdap:
         return self._ldap_bind_dn
 
     @property
-    def ldap_pool(self):
+    def ldap_pool(self) -> "LdapPool":
         if not self._ldap_pool:
             raise LdapNoBackend
         return self._ldap_pool
 
+    @property
+    def ldap_retries(self):
+        return self._ldap_retries
+
+    @property
+    def ldap_retry_backoff(self):
+        return self._ldap_retry_backoff
+
     @property
     def ldap_url(self):
         return self._ldap_url
@@ -57,45 +76,80 @@ class CrudLdap:
     async def _ldap_search(
         self,
         base_dn: str,
-        scope: bonsai.LDAPSearchScope,
+        scope: "bonsai.LDAPSearchScope",
         query: str,
     ):
-        counter = self.ldap_pool.max_connection + 3
-        while counter >= 0:
-            conn = await self.ldap_pool.get()
+        import bonsai.errors
+        import bonsai.pool
+
+        retries = self.ldap_retries
+        while True:
+            try:
+                conn = await self.ldap_pool.get()
+            except bonsai.pool.EmptyPool as err:
+                self.log.error(f"ldap pool exhausted: {err}")
+                raise LdapPoolTimeout
+            healthy = True
             try:
-                return await conn.search(base_dn, scope, query)
-            except bonsai.pool.EmptyPool:
-                self.log.warning("ldap pool empty, waiting 1 second")
-                await asyncio.sleep(1)
+                with catweazle.tracing.span(
+                    "ldap search", attributes={"catweazle.ldap.base_dn": base_dn}
+                ):
+                    with catweazle.metrics.ldap_operation_duration.labels(
+                        "search"
+                    ).time():
+                        return await conn.search(base_dn, scope, query)
             except bonsai.errors.ConnectionError:
-                conn.close()
-                if counter == 0:
+                healthy = False
+                if retries <= 0:
                     self.log.error("lost ldap connection, no more retries left")
-                else:
-                    self.log.error(f"lost ldap connection, {counter} retries left")
-                    counter -= 1
+                    raise BackendError
+                backoff = self.ldap_retry_backoff * 2 ** (self.ldap_retries - retries)
+                self.log.error(
+                    f"lost ldap connection, {retries} retries left, retrying in {backoff} seconds"
+                )
+                retries -= 1
             finally:
-                await self.ldap_pool.put(conn)
+                if healthy:
+                    await self.ldap_pool.put(conn)
+                else:
+                    await self.ldap_pool.discard(conn)
+            await asyncio.sleep(backoff)
 
     async def check_user_credentials(self, user: str, password: str):
         if not self.ldap_url:
             raise AuthenticationError
+        import bonsai
+        import bonsai.errors
+
         client = bonsai.LDAPClient(self.ldap_url)
         user_name = self.ldap_user_pattern.format(user)
         client.set_credentials("SIMPLE", user_name, password)
         try:
-            async with client.connect(is_async=True) as conn:
-                user = await conn.search(
-                    self.ldap_base_dn,
-                    bonsai.LDAPSearchScope.SUBTREE,
-                    f"(userPrincipalName={user_name})",
-                )
+            with catweazle.tracing.span("ldap bind"):
+                with catweazle.metrics.ldap_operation_duration.labels("bind").time():
+                    conn = await client.connect(is_async=True)
+            try:
+                with catweazle.tracing.span(
+                    "ldap search",
+                    attributes={"catweazle.ldap.base_dn": self.ldap_base_dn},
+                ):
+                    with catweazle.metrics.ldap_operation_duration.labels(
+                        "search"
+                    ).time():
+                        user = await conn.search(
+                            self.ldap_base_dn,
+                            bonsai.LDAPSearchScope.SUBTREE,
+                            f"(userPrincipalName={user_name})",
+                        )
+            finally:
+                conn.close()
         except bonsai.errors.AuthenticationError:
             raise AuthenticationError
         return user[0]
 
     async def get_login(self, user: str):
+        import bonsai
+
         user_cn, user_base = user.split(",", maxsplit=1)
         user = await self._ldap_search(
             base_dn=user_base, scope=bonsai.LDAPSearchScope.ONELEVEL, query=user_cn
@@ -103,6 +157,8 @@ class CrudLdap:
         return user[0]["sAMAccountName"]
 
     async def get_logins_from_group(self, group: str):
+        import bonsai
+
         try:
             group_cn, group_base = group.split(",", maxsplit=1)
         except ValueError:
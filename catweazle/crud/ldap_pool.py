@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import bonsai
+import bonsai.asyncio
+import bonsai.errors
+import bonsai.pool
+
+
+class LdapPool(bonsai.asyncio.AIOConnectionPool):
+    def __init__(
+        self,
+        client: bonsai.LDAPClient,
+        minconn: int = 1,
+        maxconn: int = 30,
+        acquire_timeout: float = 10.0,
+    ):
+        super(LdapPool, self).__init__(client=client, minconn=minconn, maxconn=maxconn)
+        self._acquire_timeout = acquire_timeout
+        self._acquired = 0
+        self._reconnects = 0
+        self._timeouts = 0
+        self._waiting = 0
+        self._wait_time_max = 0.0
+        self._wait_time_total = 0.0
+
+    @property
+    def acquire_timeout(self):
+        return self._acquire_timeout
+
+    async def get(self) -> bonsai.asyncio.AIOLDAPConnection:
+        start = time.monotonic()
+        self._waiting += 1
+        try:
+            conn = await asyncio.wait_for(super().get(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise bonsai.pool.EmptyPool(
+                f"no ldap connection available after {self.acquire_timeout} seconds"
+            )
+        finally:
+            self._waiting -= 1
+        wait_time = time.monotonic() - start
+        self._acquired += 1
+        self._wait_time_total += wait_time
+        self._wait_time_max = max(self._wait_time_max, wait_time)
+        return conn
+
+    async def discard(self, conn: bonsai.asyncio.AIOLDAPConnection) -> None:
+        # a failed connection is dropped, the next get opens a new one
+        conn.close()
+        async with self._lock:
+            self._used.discard(conn)
+            self._lock.notify()
+        self._reconnects += 1
+
+    def stats(self) -> dict:
+        return {
+            "min": self._minconn,
+            "max": self.max_connection,
+            "in_use": self.shared_connection,
+            "idle": self.idle_connection,
+            "waiting": self._waiting,
+            "acquired": self._acquired,
+            "timeouts": self._timeouts,
+            "reconnects": self._reconnects,
+            "wait_time_max": self._wait_time_max,
+            "wait_time_total": self._wait_time_total,
+        }
+
+    async def ping(self) -> None:
+        conn = await self.get()
+        healthy = True
+        try:
+            await conn.whoami()
+        except bonsai.errors.ConnectionError:
+            healthy = False
+            raise
+        finally:
+            if healthy:
+                await self.put(conn)
+            else:
+                await self.discard(conn)
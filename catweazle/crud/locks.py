@@ -0,0 +1,43 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import UTC
+
+import pymongo.errors
+
+from catweazle.crud.common import CrudMongo
+
+from catweazle.errors import BackendError
+
+
+class CrudLocks(CrudMongo):
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = datetime.now(UTC)
+        try:
+            with self._operation("acquire"):
+                await self.coll.find_one_and_update(
+                    filter={
+                        "_id": name,
+                        "$or": [{"expires": {"$lt": now}}, {"owner": owner}],
+                    },
+                    update={
+                        "$set": {
+                            "owner": owner,
+                            "expires": now + timedelta(seconds=ttl),
+                        }
+                    },
+                    upsert=True,
+                )
+        except pymongo.errors.DuplicateKeyError:
+            return False
+        except pymongo.errors.ConnectionFailure as err:
+            self.log.error(f"backend error: {err}")
+            raise BackendError
+        return True
+
+    async def release(self, name: str, owner: str) -> None:
+        try:
+            with self._operation("release"):
+                await self.coll.delete_one({"_id": name, "owner": owner})
+        except pymongo.errors.ConnectionFailure as err:
+            self.log.error(f"backend error: {err}")
+            raise BackendError
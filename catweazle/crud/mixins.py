@@ -1,5 +1,13 @@
+import base64
+import binascii
+
+from bson import json_util
 import pymongo
 
+from catweazle.errors import InvalidCursor
+
+from catweazle.model.v2.common import ModelV2MetaMulti
+
 
 class FilterMixIn(object):
     @staticmethod
@@ -12,6 +20,16 @@ class FilterMixIn(object):
             selector = False
         query[field] = selector
 
+    @staticmethod
+    def _filter_dict(query, field, selector):
+        if not selector:
+            return
+        for key, values in selector.items():
+            if len(values) == 1:
+                query[f"{field}.{key}"] = values[0]
+            else:
+                query[f"{field}.{key}"] = {"$in": values}
+
     @staticmethod
     def _filter_list(query, field, selector, nin=False):
         if selector is None:
@@ -49,8 +67,57 @@ class Format:
         return item
 
     @staticmethod
-    def _format_multi(item, count=None):
-        return {"result": item, "meta": {"result_size": count}}
+    def _format_model_multi(model_multi, model, result):
+        return model_multi.model_construct(
+            result=[model.model_construct(**item) for item in result["result"]],
+            meta=ModelV2MetaMulti.model_construct(**result["meta"]),
+        )
+
+    @staticmethod
+    def _format_multi(item, count=None, next_cursor=None):
+        meta = {}
+        if count is not None:
+            meta["result_size"] = count
+        if next_cursor:
+            meta["next"] = next_cursor
+        return {"result": item, "meta": meta}
+
+
+class PaginationCursorMixIn:
+    @staticmethod
+    def _pagination_cursor_decode(cursor, sort, sort_order):
+        try:
+            data = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+            value = data["v"]
+            _id = data["i"]
+        except (binascii.Error, KeyError, TypeError, ValueError):
+            raise InvalidCursor
+        if data.get("s") != sort or data.get("o") != sort_order:
+            raise InvalidCursor
+        return value, _id
+
+    @staticmethod
+    def _pagination_cursor_encode(item, sort, sort_order):
+        data = {"s": sort, "o": sort_order, "v": item.get(sort), "i": item["_id"]}
+        return base64.urlsafe_b64encode(json_util.dumps(data).encode()).decode()
+
+    @staticmethod
+    def _pagination_cursor_query(sort, sort_order, value, _id, unique):
+        op = "$gt" if sort_order == "ascending" else "$lt"
+        # null and missing values sort before all other values
+        if value is None:
+            query = {sort: None, "_id": {op: _id}}
+            if sort_order == "ascending":
+                return {"$or": [query, {sort: {"$ne": None}}]}
+            return query
+        conditions = [{sort: {op: value}}]
+        if not unique:
+            conditions.append({sort: value, "_id": {op: _id}})
+        if sort_order != "ascending":
+            conditions.append({sort: None})
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$or": conditions}
 
 
 class PaginationSkipMixIn:
@@ -72,8 +139,11 @@ class ProjectionMixIn:
 
 class SortMixIn:
     @staticmethod
-    def _sort(sort, sort_order):
+    def _sort(sort, sort_order, tiebreaker=False):
         if sort_order == "ascending":
-            return [(sort, pymongo.ASCENDING)]
+            direction = pymongo.ASCENDING
         else:
-            return [(sort, pymongo.DESCENDING)]
+            direction = pymongo.DESCENDING
+        if tiebreaker:
+            return [(sort, direction), ("_id", direction)]
+        return [(sort, direction)]
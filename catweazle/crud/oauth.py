@@ -1,9 +1,11 @@
 import logging
-
-from authlib.integrations.starlette_client import OAuth as authlibOauth
+import typing
 
 import httpx
 
+if typing.TYPE_CHECKING:
+    from authlib.integrations.starlette_client import OAuth as authlibOauth
+
 
 class CrudOAuth:
     def __init__(
@@ -12,7 +14,7 @@ class CrudOAuth:
         http: httpx.AsyncClient,
         backend_override: bool,
         name: str,
-        oauth: authlibOauth,
+        oauth: "authlibOauth",
         scope: str,
         client_id: str,
         client_secret: str,
@@ -79,7 +81,7 @@ class CrudOAuthGitHub(CrudOAuth):
         http: httpx.AsyncClient,
         backend_override: bool,
         name: str,
-        oauth: authlibOauth,
+        oauth: "authlibOauth",
         scope: str,
         client_id: str,
         client_secret: str,
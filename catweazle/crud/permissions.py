@@ -7,6 +7,7 @@ import pymongo.errors
 
 from catweazle.crud.common import CrudMongo
 
+from catweazle.model.v2.common import count_literal
 from catweazle.model.v2.common import ModelV2DataDelete
 from catweazle.model.v2.common import sort_order_literal
 from catweazle.model.v2.permissions import ModelV2PermissionGet
@@ -16,28 +17,22 @@ from catweazle.model.v2.permissions import ModelV2PermissionPut
 
 
 class CrudPermissions(CrudMongo):
-    def __init__(self, log: logging.Logger, coll: AsyncIOMotorCollection):
-        super(CrudPermissions, self).__init__(log=log, coll=coll)
+    indexes_required = (pymongo.IndexModel([("id", pymongo.ASCENDING)], unique=True),)
+    indexes_recommended = (
+        pymongo.IndexModel([("ldap_group", pymongo.ASCENDING)]),
+        pymongo.IndexModel([("users", pymongo.ASCENDING)]),
+        pymongo.IndexModel([("permissions", pymongo.ASCENDING)]),
+    )
 
-    async def index_create(self) -> None:
-        self.log.info(f"creating {self.resource_type} indices")
-        await self.coll.create_index(
-            [
-                ("id", pymongo.ASCENDING),
-            ],
-            unique=True,
-        )
-        await self.coll.create_index(
-            [
-                ("ldap_group", pymongo.ASCENDING),
-            ]
-        )
-        await self.coll.create_index(
-            [
-                ("users", pymongo.ASCENDING),
-            ]
+    def __init__(
+        self,
+        log: logging.Logger,
+        coll: AsyncIOMotorCollection,
+        search_read_preference: typing.Optional[str] = None,
+    ):
+        super(CrudPermissions, self).__init__(
+            log=log, coll=coll, search_read_preference=search_read_preference
         )
-        self.log.info(f"creating {self.resource_type} indices, done")
 
     async def create(
         self,
@@ -48,7 +43,7 @@ class CrudPermissions(CrudMongo):
         data = payload.model_dump()
         data["id"] = _id
         result = await self._create(payload=data, fields=fields)
-        return ModelV2PermissionGet(**result)
+        return ModelV2PermissionGet.model_construct(**result)
 
     async def delete(
         self,
@@ -61,10 +56,11 @@ class CrudPermissions(CrudMongo):
     async def delete_user_from_permissions(self, user_id):
         query = {}
         update = {"$pull": {"users": user_id}}
-        await self._coll.update_many(
-            filter=query,
-            update=update,
-        )
+        with self._operation("delete_user_from_permissions"):
+            await self._coll.update_many(
+                filter=query,
+                update=update,
+            )
 
     async def get(
         self,
@@ -73,7 +69,7 @@ class CrudPermissions(CrudMongo):
     ) -> ModelV2PermissionGet:
         query = {"id": _id}
         result = await self._get(query=query, fields=fields)
-        return ModelV2PermissionGet(**result)
+        return ModelV2PermissionGet.model_construct(**result)
 
     async def resource_exists(
         self,
@@ -93,6 +89,8 @@ class CrudPermissions(CrudMongo):
         sort_order: typing.Optional[sort_order_literal] = None,
         page: typing.Optional[int] = None,
         limit: typing.Optional[int] = None,
+        cursor: typing.Optional[str] = None,
+        count: count_literal = "exact",
     ) -> ModelV2PermissionGetMulti:
         query = {}
         self._filter_re(query, "id", _id)
@@ -107,8 +105,12 @@ class CrudPermissions(CrudMongo):
             sort_order=sort_order,
             page=page,
             limit=limit,
+            cursor=cursor,
+            count=count,
+        )
+        return self._format_model_multi(
+            ModelV2PermissionGetMulti, ModelV2PermissionGet, result
         )
-        return ModelV2PermissionGetMulti(**result)
 
     async def update(
         self,
@@ -120,4 +122,4 @@ class CrudPermissions(CrudMongo):
         data = payload.model_dump()
 
         result = await self._update(query=query, fields=fields, payload=data)
-        return ModelV2PermissionGet(**result)
+        return ModelV2PermissionGet.model_construct(**result)
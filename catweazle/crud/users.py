@@ -7,12 +7,15 @@ from passlib.hash import pbkdf2_sha512
 import pymongo
 import pymongo.errors
 
+import catweazle.metrics
+
 from catweazle.crud.common import CrudMongo
 from catweazle.crud.ldap import CrudLdap
 
 from catweazle.errors import AuthenticationError
 from catweazle.errors import BackendError
 
+from catweazle.model.v2.common import count_literal
 from catweazle.model.v2.common import ModelV2DataDelete
 from catweazle.model.v2.common import sort_order_literal
 from catweazle.model.v2.authenticate import ModelV2AuthenticatePost
@@ -23,20 +26,25 @@ from catweazle.model.v2.users import ModelV2UserPut
 
 
 class CrudUsers(CrudMongo):
+    indexes_required = (pymongo.IndexModel([("id", pymongo.ASCENDING)], unique=True),)
+    indexes_recommended = (
+        pymongo.IndexModel([("admin", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]),
+        pymongo.IndexModel([("email", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]),
+        pymongo.IndexModel([("name", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]),
+    )
+
     def __init__(
         self,
         log: logging.Logger,
         coll: AsyncIOMotorCollection,
         crud_ldap: CrudLdap,
+        search_read_preference: typing.Optional[str] = None,
     ):
-        super(CrudUsers, self).__init__(log=log, coll=coll)
+        super(CrudUsers, self).__init__(
+            log=log, coll=coll, search_read_preference=search_read_preference
+        )
         self._crud_ldap = crud_ldap
 
-    async def index_create(self) -> None:
-        self.log.info(f"creating {self.resource_type} indices")
-        await self.coll.create_index([("id", pymongo.ASCENDING)], unique=True)
-        self.log.info(f"creating {self.resource_type} indices, done")
-
     @property
     def crud_ldap(self):
         return self._crud_ldap
@@ -49,16 +57,19 @@ class CrudUsers(CrudMongo):
         user = credentials.user
         password = credentials.password
         try:
-            result = await self._coll.find_one(
-                filter={"id": user},
-                projection={"password": 1, "backend": 1},
-            )
+            with self._operation("check_credentials"):
+                result = await self._coll.find_one(
+                    filter={"id": user},
+                    projection={"password": 1, "backend": 1},
+                )
             if not result:
                 await self.check_credentials_ldap_and_create_user(
                     credentials=credentials
                 )
             elif result["backend"] == "internal":
-                if not pbkdf2_sha512.verify(password, result["password"]):
+                with catweazle.metrics.pbkdf2_verify_duration.labels("password").time():
+                    valid = pbkdf2_sha512.verify(password, result["password"])
+                if not valid:
                     raise AuthenticationError
             elif result["backend"] == "ldap":
                 try:
@@ -109,7 +120,7 @@ class CrudUsers(CrudMongo):
         data["password"] = self._password(payload.password)
         data["backend"] = "internal"
         result = await self._create(payload=data, fields=fields)
-        return ModelV2UserGet(**result)
+        return ModelV2UserGet.model_construct(**result)
 
     async def create_external(
         self,
@@ -122,7 +133,7 @@ class CrudUsers(CrudMongo):
         data["id"] = _id
         data["backend"] = backend
         result = await self._create(payload=data, fields=fields)
-        return ModelV2UserGet(**result)
+        return ModelV2UserGet.model_construct(**result)
 
     async def delete(
         self,
@@ -139,7 +150,7 @@ class CrudUsers(CrudMongo):
     ) -> ModelV2UserGet:
         query = {"id": _id}
         result = await self._get(query=query, fields=fields)
-        return ModelV2UserGet(**result)
+        return ModelV2UserGet.model_construct(**result)
 
     async def resource_exists(
         self,
@@ -156,6 +167,8 @@ class CrudUsers(CrudMongo):
         sort_order: typing.Optional[sort_order_literal] = None,
         page: typing.Optional[int] = None,
         limit: typing.Optional[int] = None,
+        cursor: typing.Optional[str] = None,
+        count: count_literal = "exact",
     ) -> ModelV2UserGetMulti:
         query = {}
         self._filter_re(query, "id", _id)
@@ -167,8 +180,10 @@ class CrudUsers(CrudMongo):
             sort_order=sort_order,
             page=page,
             limit=limit,
+            cursor=cursor,
+            count=count,
         )
-        return ModelV2UserGetMulti(**result)
+        return self._format_model_multi(ModelV2UserGetMulti, ModelV2UserGet, result)
 
     async def update(
         self,
@@ -186,4 +201,4 @@ class CrudUsers(CrudMongo):
                 data["passwort"] = None
 
         result = await self._update(query=query, fields=fields, payload=data)
-        return ModelV2UserGet(**result)
+        return ModelV2UserGet.model_construct(**result)
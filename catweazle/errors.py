@@ -20,6 +20,36 @@ class ResourceNotFound(HTTPException):
         super(ResourceNotFound, self).__init__(status_code=404, detail=details)
 
 
+class IdempotencyKeyMismatch(HTTPException):
+    def __init__(self):
+        super(IdempotencyKeyMismatch, self).__init__(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request",
+        )
+
+
+class IdempotencyInProgress(HTTPException):
+    def __init__(self):
+        super(IdempotencyInProgress, self).__init__(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress",
+        )
+
+
+class InvalidCursor(HTTPException):
+    def __init__(self):
+        super(InvalidCursor, self).__init__(
+            status_code=400, detail="Invalid or expired pagination cursor"
+        )
+
+
+class InvalidMetaFilter(HTTPException):
+    def __init__(self, key):
+        super(InvalidMetaFilter, self).__init__(
+            status_code=400, detail=f"Invalid meta filter: {key}"
+        )
+
+
 class BackendError(HTTPException):
     def __init__(self):
         super(BackendError, self).__init__(
@@ -48,6 +78,14 @@ class LdapNoBackend(HTTPException):
         )
 
 
+class LdapPoolTimeout(HTTPException):
+    def __init__(self):
+        super(LdapPoolTimeout, self).__init__(
+            status_code=503,
+            detail="Ldap connection pool exhausted, please retry later",
+        )
+
+
 class AdminError(HTTPException):
     def __init__(self):
         super(AdminError, self).__init__(
@@ -0,0 +1,158 @@
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+import typing
+
+
+class JsonFormatter(logging.Formatter):
+    reserved = frozenset(
+        logging.LogRecord("", 0, "", 0, "", (), None).__dict__.keys()
+        | {"message", "asctime", "color_message"}
+    )
+
+    def format(self, record: logging.LogRecord) -> str:
+        item = {
+            "timestamp": datetime.datetime.fromtimestamp(
+                record.created, tz=datetime.UTC
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self.reserved and not key.startswith("_"):
+                item[key] = value
+        if record.exc_info:
+            item["exception"] = self.formatException(record.exc_info)
+        return json.dumps(item, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(
+        self,
+        rate: typing.Optional[float] = None,
+        burst: int = 100,
+        sample: float = 1.0,
+    ):
+        super().__init__()
+        self._rate = rate
+        self._burst = burst
+        self._sample = sample
+        self._buckets: typing.Dict[str, typing.List[float]] = {}
+        self._suppressed: typing.Dict[str, int] = {}
+
+    def _allow(self, name: str) -> bool:
+        if self._sample < 1.0 and random.random() >= self._sample:
+            return False
+        if self._rate is None:
+            return True
+        now = time.monotonic()
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = [float(self._burst), now]
+        tokens = min(self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+        bucket[1] = now
+        if tokens < 1.0:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1.0
+        return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        if not self._allow(record.name):
+            self._suppressed[record.name] = self._suppressed.get(record.name, 0) + 1
+            return False
+        suppressed = self._suppressed.pop(record.name, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # formatting is left to the listener thread
+        return record
+
+
+class LogQueue:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        queue_handler: LogQueueHandler,
+        handlers: typing.List[logging.Handler],
+    ):
+        self._logger = logger
+        self._queue_handler = queue_handler
+        self._handlers = handlers
+        self._listener = logging.handlers.QueueListener(
+            queue_handler.queue, *handlers, respect_handler_level=True
+        )
+
+    @property
+    def dropped(self) -> int:
+        return self._queue_handler.dropped
+
+    def start(self) -> None:
+        for handler in self._handlers:
+            self._logger.removeHandler(handler)
+        self._logger.addHandler(self._queue_handler)
+        self._listener.start()
+
+    def stop(self) -> None:
+        self._logger.removeHandler(self._queue_handler)
+        self._listener.stop()
+        for handler in self._handlers:
+            self._logger.addHandler(handler)
+
+
+def setup_queue_logging(
+    names: typing.Iterable[str],
+    log_format: str = "text",
+    queue_size: int = 10000,
+    rate: typing.Optional[float] = None,
+    burst: int = 100,
+    sample: float = 1.0,
+) -> typing.List[LogQueue]:
+    log_queues = []
+    rate_limit = RateLimitFilter(rate=rate, burst=burst, sample=sample)
+    for name in names:
+        logger = logging.getLogger(name)
+        if any(isinstance(h, LogQueueHandler) for h in logger.handlers):
+            continue
+        handlers = list(logger.handlers)
+        if not handlers:
+            continue
+        if log_format == "json":
+            for handler in handlers:
+                handler.setFormatter(JsonFormatter())
+        queue_handler = LogQueueHandler(queue.Queue(maxsize=queue_size))
+        queue_handler.addFilter(rate_limit)
+        log_queue = LogQueue(
+            logger=logger, queue_handler=queue_handler, handlers=handlers
+        )
+        log_queue.start()
+        log_queues.append(log_queue)
+    return log_queues
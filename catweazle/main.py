@@ -1,65 +1,108 @@
+import asyncio
 from contextlib import asynccontextmanager
 import logging
+import os
 import random
 import string
 import sys
+import tempfile
 import time
 from typing import List
+import typing
 
-from authlib.integrations.starlette_client import OAuth
-import bonsai.asyncio
 import httpx
 from fastapi import FastAPI
 from motor.motor_asyncio import AsyncIOMotorClient
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from opentelemetry.trace import SpanKind
+import pymongo.errors
 from starlette.middleware.sessions import SessionMiddleware
 import uvicorn
 
 import catweazle.controller
 import catweazle.controller.oauth
+import catweazle.log
+import catweazle.metrics
+import catweazle.tracing
 
 from catweazle.authorize import Authorize
 
-from catweazle.config import Config
+from catweazle.config import get_config
 from catweazle.config import ConfigLdap as SettingsLdap
+from catweazle.config import ConfigLogging as SettingsLogging
+from catweazle.config import ConfigMongodb as SettingsMongodb
 from catweazle.config import ConfigOAuth as SettingsOAuth
+from catweazle.config import ConfigTracing as SettingsTracing
 
+from catweazle.crud.audit import CrudAudit
 from catweazle.crud.credentials import CrudCredentials
 from catweazle.crud.ldap import CrudLdap
 from catweazle.crud.foreman import CrudForeman
+from catweazle.crud.health import CrudHealth
+from catweazle.crud.idempotency import CrudIdempotency
 from catweazle.crud.instances import CrudInstances
+from catweazle.crud.instances_gc import CrudInstancesGc
+from catweazle.crud.instances_replica import CrudInstancesReplica
+from catweazle.crud.locks import CrudLocks
 from catweazle.crud.oauth import CrudOAuthGitHub
 from catweazle.crud.permissions import CrudPermissions
 from catweazle.crud.users import CrudUsers
 
 from catweazle.model.v2.users import ModelV2UserPost
 
+from catweazle.errors import DuplicateResource
 from catweazle.errors import ResourceNotFound
 
 
-settings = Config()
+settings = get_config()
+
+if typing.TYPE_CHECKING:
+    from opentelemetry.sdk.trace import TracerProvider
+
+    from catweazle.crud.ldap_pool import LdapPool
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    log = setup_logging(
-        settings.app.loglevel,
+    log, log_queues = setup_logging(
+        log_level=settings.app.loglevel,
+        settings_logging=settings.logging,
     )
+    startup = StartupTimer(log=log)
 
-    http = httpx.AsyncClient()
-
-    ldap_pool = await setup_ldap(
+    tracer_provider = setup_tracing(
         log=log,
-        settings_ldap=settings.ldap,
+        settings_tracing=settings.tracing,
     )
+    startup.checkpoint("tracing")
+
+    http = httpx.AsyncClient()
+    tasks = []
 
-    log.info("adding routes")
     mongo_db = setup_mongodb(
         log=log,
-        database=settings.mongodb.database,
-        url=settings.mongodb.url,
+        settings_mongodb=settings.mongodb,
     )
+    ldap_pool, _ = await asyncio.gather(
+        startup.run(
+            "ldap",
+            setup_ldap(
+                log=log,
+                settings_ldap=settings.ldap,
+            ),
+        ),
+        startup.run(
+            "mongodb",
+            setup_mongodb_prewarm(
+                log=log,
+                mongo_db=mongo_db,
+                connections=settings.mongodb.minpoolsize,
+            ),
+        ),
+    )
+    startup.checkpoint("connect")
 
+    log.info("adding routes")
     crud_foreman_backends = setup_foreman_backend(log=log)
 
     crud_oauth = setup_oauth_providers(
@@ -73,35 +116,138 @@ async def lifespan(app: FastAPI):
         ldap_base_dn=settings.ldap.basedn,
         ldap_bind_dn=settings.ldap.binddn,
         ldap_pool=ldap_pool,
+        ldap_retries=settings.ldap.retries,
+        ldap_retry_backoff=settings.ldap.retrybackoff,
         ldap_url=settings.ldap.url,
         ldap_user_pattern=settings.ldap.userpattern,
     )
 
+    crud_audit = CrudAudit(
+        log=log,
+        coll=mongo_db["audit"],
+        retention=settings.audit.retention,
+        queue_size=settings.audit.queuesize,
+        batch_size=settings.audit.batchsize,
+        flush_interval=settings.audit.flushinterval,
+        block_timeout=settings.audit.blocktimeout,
+        search_read_preference=settings.mongodb.searchreadpreference,
+    )
+    tasks.append(crud_audit.index_create_background())
+    crud_audit.writer_background()
+
+    crud_instances_replica = None
+    if settings.mongodb.instancesreplica:
+        crud_instances_replica = CrudInstancesReplica(
+            log=log,
+            coll=mongo_db["instances"],
+            domain_suffix=settings.app.domainsuffix,
+            max_lag=settings.mongodb.instancesreplicamaxlag,
+        )
+
     crud_instances = CrudInstances(
         log=log,
         coll=mongo_db["instances"],
+        search_read_preference=settings.mongodb.searchreadpreference,
         domain_suffix=settings.app.domainsuffix,
+        replica=crud_instances_replica,
     )
-    await crud_instances.index_create()
+    tasks.append(crud_instances.index_create_background())
+    tasks.append(crud_instances.ip_backfill_background())
+
+    crud_idempotency = CrudIdempotency(
+        log=log,
+        coll=mongo_db["idempotency"],
+        ttl=settings.idempotency.ttl,
+        pending_timeout=settings.idempotency.pendingtimeout,
+    )
+    tasks.append(crud_idempotency.index_create_background())
+
+    crud_locks = CrudLocks(
+        log=log,
+        coll=mongo_db["locks"],
+    )
+
+    crud_instances_gc = CrudInstancesGc(
+        log=log,
+        crud_audit=crud_audit,
+        crud_idempotency=crud_idempotency,
+        crud_instances=crud_instances,
+        crud_foreman_backends=crud_foreman_backends,
+        crud_locks=crud_locks,
+        interval=settings.gc.interval,
+        states=settings.gc.states.split(),
+        state_age=settings.gc.stateage,
+        max_age=settings.gc.maxage,
+        batch_size=settings.gc.batchsize,
+        rate=settings.gc.rate,
+    )
+    if settings.gc.enable:
+        tasks.append(crud_instances_gc.run_background())
 
     crud_permissions = CrudPermissions(
         log=log,
         coll=mongo_db["permissions"],
+        search_read_preference=settings.mongodb.searchreadpreference,
     )
-    await crud_permissions.index_create()
+    tasks.append(crud_permissions.index_create_background())
 
     crud_users = CrudUsers(
         log=log,
         coll=mongo_db["users"],
         crud_ldap=crud_ldap,
+        search_read_preference=settings.mongodb.searchreadpreference,
     )
-    await crud_users.index_create()
+    tasks.append(crud_users.index_create_background())
 
     crud_users_credentials = CrudCredentials(
         log=log,
         coll=mongo_db["users_credentials"],
+        search_read_preference=settings.mongodb.searchreadpreference,
+    )
+    tasks.append(crud_users_credentials.index_create_background())
+
+    crud_health = CrudHealth(
+        log=log,
+        mongo_db=mongo_db,
+        ldap_pool=ldap_pool,
+        crud_foreman_backends=crud_foreman_backends,
+        crud_mongo=[
+            crud_audit,
+            crud_idempotency,
+            crud_instances,
+            crud_permissions,
+            crud_users,
+            crud_users_credentials,
+        ],
+        interval=settings.health.interval,
+        timeout=settings.health.timeout,
+        max_age=settings.health.maxage,
     )
-    await crud_users_credentials.index_create()
+    tasks.append(crud_health.run_background())
+    startup.checkpoint("crud")
+
+    # unique indexes must exist before anything is written or served
+    await startup.run(
+        "indexes",
+        asyncio.gather(
+            crud_audit.index_create_required(),
+            crud_idempotency.index_create_required(),
+            crud_instances.index_create_required(),
+            crud_permissions.index_create_required(),
+            crud_users.index_create_required(),
+            crud_users_credentials.index_create_required(),
+        ),
+    )
+
+    jobs = [startup.run("admin", setup_admin_user(log=log, crud_users=crud_users))]
+    if settings.mongodb.changestream:
+        jobs.append(startup.run("preimages", crud_instances.preimages_enable()))
+    await asyncio.gather(*jobs)
+    if crud_instances_replica:
+        tasks.append(crud_instances.replica_background())
+    elif settings.mongodb.changestream:
+        tasks.append(crud_instances.watch_background())
+    startup.checkpoint("prepare")
 
     authorize = Authorize(
         log=log,
@@ -113,20 +259,77 @@ async def lifespan(app: FastAPI):
     controller = catweazle.controller.Controller(
         log=log,
         authorize=authorize,
+        crud_audit=crud_audit,
         crud_ldap=crud_ldap,
         crud_foreman_backends=crud_foreman_backends,
+        crud_health=crud_health,
+        crud_idempotency=crud_idempotency,
         crud_instances=crud_instances,
+        crud_instances_gc=crud_instances_gc,
         crud_permissions=crud_permissions,
         crud_users=crud_users,
         crud_users_credentials=crud_users_credentials,
         crud_oauth=crud_oauth,
         http=http,
+        metrics=settings.app.metrics,
     )
     app.include_router(controller.router)
 
     log.info("adding routes, done")
-    await setup_admin_user(log=log, crud_users=crud_users)
+    startup.checkpoint("routes")
+    startup.report()
     yield
+    log.info("shutting down")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await crud_audit.close()
+    for foreman in crud_foreman_backends:
+        await foreman.close()
+    if ldap_pool:
+        await ldap_pool.close()
+    await http.aclose()
+    mongo_db.client.close()
+    catweazle.metrics.mark_process_dead(os.getpid())
+    if tracer_provider:
+        tracer_provider.shutdown()
+    log.info("shutting down, done")
+    for log_queue in log_queues:
+        log_queue.stop()
+
+
+class StartupTimer:
+    def __init__(self, log: logging.Logger):
+        self._log = log
+        self._phases: typing.Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    @property
+    def log(self):
+        return self._log
+
+    def checkpoint(self, name: str) -> None:
+        now = time.perf_counter()
+        self._phases[name] = now - self._last
+        self._last = now
+
+    async def run(self, name: str, coro: typing.Awaitable):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self._phases[name] = time.perf_counter() - start
+
+    def report(self) -> None:
+        total = time.perf_counter() - self._start
+        for name, duration in self._phases.items():
+            catweazle.metrics.startup_duration.labels(name).set(duration)
+        catweazle.metrics.startup_duration.labels("total").set(total)
+        phases = " ".join(
+            f"{name}={duration:.3f}s" for name, duration in self._phases.items()
+        )
+        self.log.info(f"startup done in {total:.3f}s: {phases}")
 
 
 async def setup_admin_user(log: logging.Logger, crud_users: CrudUsers):
@@ -137,20 +340,26 @@ async def setup_admin_user(log: logging.Logger, crud_users: CrudUsers):
             random.choice(string.ascii_letters + string.digits) for _ in range(20)
         )
         log.info(f"creating admin user with password {password}")
-        await crud_users.create(
-            _id="admin",
-            payload=ModelV2UserPost(
-                admin=True,
-                email="admin@example.com",
-                name="admin",
-                password=password,
-            ),
-            fields=["_id"],
-        )
+        try:
+            await crud_users.create(
+                _id="admin",
+                payload=ModelV2UserPost(
+                    admin=True,
+                    email="admin@example.com",
+                    name="admin",
+                    password=password,
+                ),
+                fields=["_id"],
+            )
+        except DuplicateResource:
+            log.info("creating admin user, skipped: created by another worker")
+            return
         log.info("creating admin user, done")
 
 
-async def setup_ldap(log: logging.Logger, settings_ldap: SettingsLdap):
+async def setup_ldap(
+    log: logging.Logger, settings_ldap: SettingsLdap
+) -> typing.Optional["LdapPool"]:
     if not settings_ldap.url:
         log.info("ldap not configured")
         return
@@ -161,9 +370,18 @@ async def setup_ldap(log: logging.Logger, settings_ldap: SettingsLdap):
     if not settings_ldap.password:
         log.fatal("ldap password not configured")
         sys.exit(1)
+    import bonsai
+
+    from catweazle.crud.ldap_pool import LdapPool
+
     client = bonsai.LDAPClient(settings_ldap.url)
     client.set_credentials("SIMPLE", settings_ldap.binddn, settings_ldap.password)
-    pool = bonsai.asyncio.AIOConnectionPool(client=client, maxconn=30)
+    pool = LdapPool(
+        client=client,
+        minconn=settings_ldap.poolmin,
+        maxconn=settings_ldap.poolmax,
+        acquire_timeout=settings_ldap.pooltimeout,
+    )
     await pool.open()
     return pool
 
@@ -201,31 +419,97 @@ def setup_foreman_backend(log: logging.Logger) -> List[CrudForeman]:
     return backends
 
 
-def setup_logging(log_level):
+def setup_logging(log_level, settings_logging: SettingsLogging):
     log = logging.getLogger("uvicorn")
-    log.info(f"setting loglevel to: {log_level}")
+    log.info("setting loglevel to: %s", log_level)
     log.setLevel(log_level)
-    return log
+    log_queues = catweazle.log.setup_queue_logging(
+        names=("uvicorn", "uvicorn.access"),
+        log_format=settings_logging.format,
+        queue_size=settings_logging.queuesize,
+        rate=settings_logging.ratelimit,
+        burst=settings_logging.rateburst,
+        sample=settings_logging.sample,
+    )
+    return log, log_queues
+
+
+def setup_tracing(
+    log: logging.Logger, settings_tracing: SettingsTracing
+) -> typing.Optional["TracerProvider"]:
+    if not settings_tracing.enable:
+        log.info("tracing not configured")
+        return None
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased
+    from opentelemetry.sdk.trace.sampling import TraceIdRatioBased
+
+    log.info(f"setting up tracing with {settings_tracing.exporter} exporter")
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings_tracing.servicename}),
+        sampler=ParentBased(TraceIdRatioBased(settings_tracing.samplerate)),
+    )
+    provider.add_span_processor(
+        BatchSpanProcessor(catweazle.tracing.setup_exporter(settings_tracing))
+    )
+    trace.set_tracer_provider(provider)
+    log.info("setting up tracing, done")
+    return provider
 
 
-def setup_mongodb(log: logging.Logger, database: str, url: str) -> AsyncIOMotorDatabase:
+def setup_mongodb(
+    log: logging.Logger, settings_mongodb: SettingsMongodb
+) -> AsyncIOMotorDatabase:
     log.info("setting up mongodb client")
-    pool = AsyncIOMotorClient(url)
-    db = pool.get_database(database)
+    # only pass options that are set, so they do not override the url options
+    options = {
+        "maxPoolSize": settings_mongodb.maxpoolsize,
+        "minPoolSize": settings_mongodb.minpoolsize,
+        "maxIdleTimeMS": settings_mongodb.maxidletimems,
+        "compressors": settings_mongodb.compressors or None,
+        "connectTimeoutMS": settings_mongodb.connecttimeoutms,
+        "socketTimeoutMS": settings_mongodb.sockettimeoutms,
+        "serverSelectionTimeoutMS": settings_mongodb.serverselectiontimeoutms,
+        "readPreference": settings_mongodb.readpreference,
+    }
+    options = {key: value for key, value in options.items() if value is not None}
+    pool = AsyncIOMotorClient(settings_mongodb.url, **options)
+    db = pool.get_database(settings_mongodb.database)
     log.info("setting up mongodb client, done")
     return db
 
 
+async def setup_mongodb_prewarm(
+    log: logging.Logger,
+    mongo_db: AsyncIOMotorDatabase,
+    connections: typing.Optional[int],
+):
+    if not connections:
+        return
+    log.info(f"prewarming mongodb pool with {connections} connections")
+    try:
+        await asyncio.gather(*[mongo_db.command("ping") for _ in range(connections)])
+    except pymongo.errors.ConnectionFailure as err:
+        log.error(f"prewarming mongodb pool failed: {err}")
+        return
+    log.info("prewarming mongodb pool, done")
+
+
 def setup_oauth_providers(
     log: logging.Logger,
     http: httpx.AsyncClient,
     oauth_settings: dict["str", SettingsOAuth],
 ):
-    oauth = OAuth()
     providers = {}
     if not oauth_settings:
         log.info("oauth not configured")
         return providers
+    from authlib.integrations.starlette_client import OAuth
+
+    oauth = OAuth()
     for provider, config in oauth_settings.items():
         if config.type == "github":
             log.info(f"oauth setting up github provider with name {provider}")
@@ -245,11 +529,6 @@ def setup_oauth_providers(
     return providers
 
 
-app = FastAPI(title="catweazle", version="0.0.0", lifespan=lifespan)
-app.add_middleware(SessionMiddleware, secret_key=settings.app.secretkey, max_age=3600)
-
-
-@app.middleware("http")
 async def add_process_time_header(request, call_next):
     start_time = time.time()
     response = await call_next(request)
@@ -258,14 +537,86 @@ async def add_process_time_header(request, call_next):
     return response
 
 
-def main():
-    uvicorn.run(
-        app,
-        host=settings.app.host,
-        port=settings.app.port,
-        proxy_headers=settings.app.proxyheaders,
-        forwarded_allow_ips=settings.app.forwardedallowips,
+async def record_request_metrics(request, call_next):
+    method = request.method
+    in_flight = catweazle.metrics.http_requests_in_flight.labels(method)
+    in_flight.inc()
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        in_flight.dec()
+        route = request.scope.get("route")
+        catweazle.metrics.http_request_duration.labels(
+            method, getattr(route, "path", "unmatched"), str(status)
+        ).observe(time.perf_counter() - start_time)
+
+
+async def trace_request(request, call_next):
+    method = request.method
+    with catweazle.tracing.span(
+        method,
+        kind=SpanKind.SERVER,
+        context=catweazle.tracing.extract(request.headers),
+        attributes={
+            "http.request.method": method,
+            "url.path": request.url.path,
+        },
+    ) as span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            span.update_name(f"{method} {route.path}")
+            span.set_attribute("http.route", route.path)
+        span.set_attribute("http.response.status_code", response.status_code)
+        return response
+
+
+def create_app() -> FastAPI:
+    _app = FastAPI(title="catweazle", version="0.0.0", lifespan=lifespan)
+    _app.add_middleware(
+        SessionMiddleware, secret_key=settings.app.secretkey, max_age=3600
     )
+    _app.middleware("http")(add_process_time_header)
+    if settings.app.metrics:
+        _app.middleware("http")(record_request_metrics)
+    if settings.tracing.enable:
+        _app.middleware("http")(trace_request)
+    return _app
+
+
+app = create_app()
+
+
+def main():
+    options = {
+        "host": settings.app.host,
+        "port": settings.app.port,
+        "uds": settings.app.uds,
+        "loop": settings.app.loop,
+        "http": settings.app.http,
+        "backlog": settings.app.backlog,
+        "limit_concurrency": settings.app.limitconcurrency,
+        "timeout_keep_alive": settings.app.timeoutkeepalive,
+        "proxy_headers": settings.app.proxyheaders,
+        "forwarded_allow_ips": settings.app.forwardedallowips,
+    }
+    if settings.app.workers > 1:
+        if settings.app.metrics and not catweazle.metrics.multiprocess_enabled():
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(
+                prefix="catweazle-metrics-"
+            )
+        uvicorn.run(
+            "catweazle.main:create_app",
+            factory=True,
+            workers=settings.app.workers,
+            **options,
+        )
+    else:
+        uvicorn.run(app, **options)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+import os
+
+from prometheus_client import CollectorRegistry
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+from prometheus_client import REGISTRY
+from prometheus_client import generate_latest
+from prometheus_client import multiprocess
+
+content_type = CONTENT_TYPE_LATEST
+
+http_request_duration = Histogram(
+    "catweazle_http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ["method", "route", "status"],
+)
+
+http_requests_in_flight = Gauge(
+    "catweazle_http_requests_in_flight",
+    "HTTP requests currently being processed",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+mongodb_operation_duration = Histogram(
+    "catweazle_mongodb_operation_duration_seconds",
+    "MongoDB operation latency by collection and operation",
+    ["collection", "operation"],
+)
+
+foreman_request_duration = Histogram(
+    "catweazle_foreman_request_duration_seconds",
+    "Foreman smart proxy request latency by backend and record type",
+    ["backend", "method", "record_type"],
+)
+
+ldap_operation_duration = Histogram(
+    "catweazle_ldap_operation_duration_seconds",
+    "LDAP search and bind latency",
+    ["operation"],
+)
+
+pbkdf2_verify_duration = Histogram(
+    "catweazle_pbkdf2_verify_duration_seconds",
+    "PBKDF2 hash verification latency",
+    ["kind"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+startup_duration = Gauge(
+    "catweazle_startup_duration_seconds",
+    "Duration of the startup phases of the last start",
+    ["phase"],
+    multiprocess_mode="max",
+)
+
+
+def multiprocess_enabled() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def mark_process_dead(pid: int) -> None:
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
+
+
+def render() -> bytes:
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
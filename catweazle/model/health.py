@@ -0,0 +1,22 @@
+from typing import Dict
+from typing import List
+from typing import Optional
+from pydantic import BaseModel
+
+
+class ModelHealthCheck(BaseModel):
+    ok: bool
+    latency: Optional[float] = None
+    error: Optional[str] = None
+
+
+class ModelHealthLiveGet(BaseModel):
+    live: bool
+    last_check: Optional[float] = None
+
+
+class ModelHealthReadyGet(BaseModel):
+    ready: bool
+    checked: Optional[float] = None
+    checks: Dict[str, ModelHealthCheck]
+    index_builds: List[str]
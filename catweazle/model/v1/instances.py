@@ -3,9 +3,6 @@ from typing import Literal
 from pydantic import BaseModel
 
 from catweazle.model.v2.instances import ModelV2InstanceGet
-from catweazle.config import Config
-
-config = Config()
 
 filter_literal = Literal[
     "id",
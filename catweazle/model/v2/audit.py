@@ -0,0 +1,50 @@
+from typing import get_args as typing_get_args
+from typing import Dict
+from typing import Optional
+from typing import List
+from typing import Literal
+
+from pydantic import BaseModel
+
+from catweazle.model.v2.common import ModelV2MetaMulti
+
+action_literal = Literal[
+    "create",
+    "update",
+    "delete",
+]
+
+filter_literal = Literal[
+    "timestamp",
+    "actor",
+    "action",
+    "resource_type",
+    "resource_id",
+    "details",
+]
+
+filter_list = set(typing_get_args(filter_literal))
+
+sort_literal = Literal["timestamp"]
+
+
+class ModelV2AuditGet(BaseModel):
+    timestamp: Optional[str] = None
+    actor: Optional[str] = None
+    action: Optional[str] = None
+    resource_type: Optional[str] = None
+    resource_id: Optional[str] = None
+    details: Optional[Dict[str, str]] = None
+
+
+class ModelV2AuditGetMulti(BaseModel):
+    result: List[ModelV2AuditGet]
+    meta: ModelV2MetaMulti
+
+
+class ModelV2AuditStatsGet(BaseModel):
+    queued: int
+    queue_size: int
+    written: int
+    dropped: int
+    failed: int
@@ -1,5 +1,6 @@
 import re
 from typing import Literal
+from typing import Optional
 from typing import Set
 
 from pydantic import BaseModel
@@ -13,9 +14,16 @@ sort_order_literal = Literal[
     "descending",
 ]
 
+count_literal = Literal[
+    "exact",
+    "estimated",
+    "none",
+]
+
 
 class ModelV2MetaMulti(BaseModel):
-    result_size: Annotated[int, Field(gt=-1)]
+    result_size: Optional[Annotated[int, Field(gt=-1)]] = None
+    next: Optional[str] = None
 
 
 class ModelV2DataDelete(BaseModel):
@@ -5,14 +5,15 @@ from typing import List
 from typing import Literal
 from typing import Optional
 from pydantic import BaseModel
+from pydantic import Field
 from pydantic import StrictStr
 from pydantic import field_validator
 from pydantic.networks import IPv4Address
+from typing_extensions import Annotated
 
 from catweazle.model.v2.common import ModelV2MetaMulti
-from catweazle.config import Config
+from catweazle.config import get_config
 
-config = Config()
 
 filter_literal = Literal[
     "id",
@@ -47,6 +48,25 @@ class ModelV2InstanceGetMulti(BaseModel):
     meta: ModelV2MetaMulti
 
 
+class ModelV2InstanceMgetPost(BaseModel):
+    ids: Annotated[List[StrictStr], Field(min_length=1, max_length=1000)]
+
+
+class ModelV2InstanceMget(BaseModel):
+    result: List[ModelV2InstanceGet]
+    missing: List[StrictStr]
+
+
+class ModelV2InstancesReplicaGet(BaseModel):
+    enabled: bool
+    ready: bool = False
+    fresh: bool = False
+    records: int = 0
+    memory_bytes: int = 0
+    lag: Optional[float] = None
+    max_lag: Optional[float] = None
+
+
 class ModelV2instancePost(BaseModel):
     dns_indicator: Optional[StrictStr] = None
     ip_address: IPv4Address
@@ -55,6 +75,7 @@ class ModelV2instancePost(BaseModel):
     @staticmethod
     @field_validator("dns_indicator", mode="before")
     def validate_dns_indicator(value):
+        config = get_config()
         regex = re.compile(config.app.indicatorregex)
         if not regex.match(value):
             raise ValueError(
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class ModelV2LdapPoolGet(BaseModel):
+    min: int
+    max: int
+    in_use: int
+    idle: int
+    waiting: int
+    acquired: int
+    timeouts: int
+    reconnects: int
+    wait_time_max: float
+    wait_time_total: float
@@ -0,0 +1,37 @@
+import hashlib
+import typing
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+class ModelResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json(exclude_unset=True).encode("utf-8")
+        return super(ModelResponse, self).render(content)
+
+
+class NotModifiedResponse(Response):
+    def __init__(self, etag: str):
+        super(NotModifiedResponse, self).__init__(
+            status_code=304, headers={"ETag": etag}
+        )
+
+
+def etag(identity: typing.Any, version: int, fields: typing.Iterable[str]) -> str:
+    digest = hashlib.sha1(
+        f"{identity}:{','.join(sorted(fields))}".encode("utf-8")
+    ).hexdigest()
+    return f'"{version}-{digest[:12]}"'
+
+
+def etag_match(request: Request, value: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return value in [item.strip() for item in if_none_match.split(",")]
@@ -0,0 +1,67 @@
+import contextlib
+import importlib
+import typing
+
+from opentelemetry import context as otel_context
+from opentelemetry import propagate
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+from opentelemetry.trace import Status
+from opentelemetry.trace import StatusCode
+
+from catweazle.config import ConfigTracing as SettingsTracing
+
+if typing.TYPE_CHECKING:
+    from opentelemetry.sdk.trace.export import SpanExporter
+
+tracer = trace.get_tracer("catweazle")
+
+
+@contextlib.contextmanager
+def span(
+    name: str,
+    kind: SpanKind = SpanKind.INTERNAL,
+    attributes: typing.Optional[dict] = None,
+    context: typing.Optional[otel_context.Context] = None,
+    current: bool = True,
+) -> typing.Iterator[trace.Span]:
+    if current:
+        with tracer.start_as_current_span(
+            name, context=context, kind=kind, attributes=attributes
+        ) as _span:
+            yield _span
+        return
+    _span = tracer.start_span(name, context=context, kind=kind, attributes=attributes)
+    try:
+        yield _span
+    except Exception as err:
+        _span.record_exception(err)
+        _span.set_status(Status(StatusCode.ERROR, f"{type(err).__name__}: {err}"))
+        raise
+    finally:
+        _span.end()
+
+
+def extract(headers: typing.Mapping[str, str]) -> otel_context.Context:
+    return propagate.extract(headers)
+
+
+def inject(headers: typing.Optional[dict] = None) -> dict:
+    headers = headers if headers is not None else {}
+    propagate.inject(headers)
+    return headers
+
+
+def setup_exporter(settings_tracing: SettingsTracing) -> "SpanExporter":
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    if settings_tracing.exporter == "console":
+        return ConsoleSpanExporter(service_name=settings_tracing.servicename)
+    if settings_tracing.exporter == "file":
+        return ConsoleSpanExporter(
+            service_name=settings_tracing.servicename,
+            out=open(settings_tracing.file, "a"),
+            formatter=lambda item: item.to_json(indent=None) + "\n",
+        )
+    module, _, name = settings_tracing.exporter.partition(":")
+    return getattr(importlib.import_module(module), name)()
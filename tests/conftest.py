@@ -0,0 +1,35 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import catweazle.main
+
+admin_password = "a" * 20
+
+
+@pytest.fixture
+def mongo():
+    return mongomock_motor.AsyncMongoMockClient()
+
+
+@pytest.fixture
+def app(monkeypatch, mongo):
+    monkeypatch.setattr(
+        catweazle.main, "AsyncIOMotorClient", lambda *args, **kwargs: mongo
+    )
+    # makes the generated admin password predictable
+    monkeypatch.setattr(random, "choice", lambda seq: "a")
+    with TestClient(catweazle.main.create_app()) as client:
+        yield client
+
+
+@pytest.fixture
+def admin(app):
+    response = app.post(
+        "/api/v2/authenticate", json={"user": "admin", "password": admin_password}
+    )
+    assert response.status_code == 201, response.text
+    return app
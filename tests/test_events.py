@@ -0,0 +1,66 @@
+import asyncio
+import logging
+
+from bson.objectid import ObjectId
+import pytest
+
+from catweazle.crud.instances import CrudInstances
+
+
+class Stream:
+    def __init__(self, changes, error=None):
+        self._changes = list(changes)
+        self._error = error
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._changes:
+            return self._changes.pop(0)
+        if self._error:
+            raise self._error
+        raise StopAsyncIteration
+
+    async def close(self):
+        pass
+
+
+class Collection:
+    name = "instances"
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def watch(self, **kwargs):
+        return self._stream
+
+
+def change(_id):
+    return {
+        "_id": {"_data": f"token-{_id}"},
+        "operationType": "delete",
+        "documentKey": {"_id": ObjectId()},
+        "fullDocumentBeforeChange": {"id": _id},
+    }
+
+
+async def collect(stream):
+    crud = CrudInstances(
+        log=logging.getLogger("test"),
+        coll=Collection(stream),
+        domain_suffix=".example.com",
+    )
+    return [event async for event in crud.events()]
+
+
+@pytest.mark.parametrize(
+    "error, terminal",
+    [(None, "closed"), (RuntimeError("boom"), "error")],
+)
+def test_events_end_when_the_reader_stops(error, terminal):
+    events = asyncio.run(
+        asyncio.wait_for(collect(Stream([change("i-1")], error=error)), timeout=5)
+    )
+    assert [event["event"] for event in events] == ["delete", terminal]
+    assert events[0]["data"] == {"id": "i-1"}
@@ -0,0 +1,70 @@
+import catweazle.main
+
+
+def create_instance(client, instance_id, ip_address="10.0.0.5"):
+    response = client.post(
+        f"/api/v2/instances/{instance_id}",
+        json={"ip_address": ip_address, "dns_indicator": "www-NUM"},
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def test_v1_get(admin):
+    instance = create_instance(admin, "i-1")
+    response = admin.get("/api/v1/instances/i-1")
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["fqdn"] == instance["fqdn"]
+    assert response.headers["etag"]
+
+    response = admin.get(
+        "/api/v1/instances/i-1", headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+
+
+def test_v2_get_etag_changes_on_recreate(admin):
+    create_instance(admin, "i-1")
+    first = admin.get("/api/v2/instances/i-1").headers["etag"]
+    assert admin.delete("/api/v2/instances/i-1").status_code == 200
+    create_instance(admin, "i-1")
+    second = admin.get("/api/v2/instances/i-1").headers["etag"]
+    assert first != second
+
+
+def search_pages(client, **params):
+    ids = []
+    cursor = None
+    while True:
+        query = dict(params, limit=10, fields="id")
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/api/v2/instances", params=query)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        ids.extend(item["id"] for item in body["result"])
+        cursor = body["meta"].get("next")
+        if not cursor:
+            return ids
+
+
+def test_search_cursor_pages_across_missing_sort_values(admin, mongo):
+    db = mongo.get_database(catweazle.main.settings.mongodb.database)
+    documents = []
+    for num in range(25):
+        document = {"id": f"i-{num:02d}", "fqdn": f"i-{num:02d}.example.com"}
+        if num % 3 == 1:
+            document["dns_indicator"] = None
+        elif num % 3 == 2:
+            document["dns_indicator"] = f"www-{num % 4}"
+        documents.append(document)
+    admin.portal.call(db["instances"].insert_many, documents)
+
+    for sort_order in ("ascending", "descending"):
+        ids = search_pages(admin, sort="dns_indicator", sort_order=sort_order)
+        assert sorted(ids) == sorted(document["id"] for document in documents)
+        nulls = [d["id"] for d in documents if not d.get("dns_indicator")]
+        if sort_order == "ascending":
+            assert set(ids[: len(nulls)]) == set(nulls)
+        else:
+            assert set(ids[-len(nulls) :]) == set(nulls)
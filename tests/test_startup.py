@@ -0,0 +1,31 @@
+import mongomock_motor
+import pymongo.errors
+import pytest
+from fastapi.testclient import TestClient
+
+import catweazle.main
+
+
+def test_required_indexes_exist_on_startup(app, mongo):
+    db = mongo.get_database(catweazle.main.settings.mongodb.database)
+    for coll in ("instances", "users"):
+        indexes = app.portal.call(db[coll].index_information)
+        assert any(
+            spec.get("unique") and list(spec["key"]) == [("id", 1)]
+            for spec in indexes.values()
+        ), coll
+
+
+def test_required_index_failure_fails_startup(monkeypatch, mongo):
+    async def create_indexes(self, indexes, *args, **kwargs):
+        raise pymongo.errors.OperationFailure("index build failed")
+
+    monkeypatch.setattr(
+        catweazle.main, "AsyncIOMotorClient", lambda *args, **kwargs: mongo
+    )
+    monkeypatch.setattr(
+        mongomock_motor.AsyncMongoMockCollection, "create_indexes", create_indexes
+    )
+    with pytest.raises(pymongo.errors.OperationFailure):
+        with TestClient(catweazle.main.create_app()):
+            pass